@@ -1,66 +1,293 @@
+import json
 import logging
+import os
 import re
-from datetime import datetime, time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, time, timedelta
+from time import sleep
+import httplib2
 import pytz
-from googleapiclient.discovery import build
+from google_auth_httplib2 import AuthorizedHttp
+from googleapiclient.discovery import build, build_from_document
+from googleapiclient.discovery_cache import get_static_doc
 from googleapiclient.errors import HttpError
+from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from email.utils import parseaddr  # ✅ Robust email parser
 
+from app.utils.gmail_quota import (
+    GMAIL_QUOTA, QUOTA_UNITS, MAX_RETRIES, backoff_delay, is_rate_limited, is_retryable
+)
+
 logging.basicConfig(level=logging.INFO)
 
+SCOPES = ["https://www.googleapis.com/auth/gmail.readonly"]
+TOKEN_PATH = "/data/token.json"
+DISCOVERY_CACHE_PATH = "/data/gmail_discovery_v1.json"
+# Points the client at another Gmail API host (e.g. tools/fake_gmail.py); None means Google
+GMAIL_API_ROOT = os.getenv("GMAIL_API_ROOT")
+# Refresh access tokens this long before they expire
+TOKEN_REFRESH_MARGIN = timedelta(minutes=5)
+
+# Gmail accepts up to 100 calls per batch request, but recommends staying at or
+# below 50 to avoid per-user rate limiting inside a single batch.
+MAX_BATCH_SIZE = 100
+DEFAULT_BATCH_SIZE = int(os.getenv("GMAIL_BATCH_SIZE", "50"))
+
+# Concurrent batch requests per fetch; the quota token bucket keeps the pool
+# inside Gmail's per-user limit no matter how many workers are configured.
+DEFAULT_MAX_WORKERS = int(os.getenv("GMAIL_FETCH_WORKERS", "4"))
+HTTP_TIMEOUT_SECONDS = 60
+
+# Fetch profiles map to messages.get parameters. The `fields` partial-response
+# masks strip everything we do not store, so "metadata" and "snippet" move a
+# small fraction of the bytes a full MIME payload does.
+FETCH_PROFILES = {
+    "metadata": {
+        "format": "metadata",
+        "metadataHeaders": ["From", "Subject"],
+        "fields": "id,internalDate,payload/headers(name,value)",
+    },
+    "snippet": {
+        "format": "metadata",
+        "metadataHeaders": ["From", "Subject"],
+        "fields": "id,snippet,internalDate,payload/headers(name,value)",
+    },
+    "full": {
+        "format": "full",
+    },
+}
+DEFAULT_FETCH_PROFILE = "snippet"
+
+# Labels that messages.list leaves out by default; history entries carrying
+# them are skipped so incremental sync matches a regular listing.
+EXCLUDED_HISTORY_LABELS = {"DRAFT", "SPAM", "TRASH"}
+
+
+class HistoryExpiredError(Exception):
+    """
+    Raised when a stored historyId is too old for users.history.list (HTTP 404).
+    """
+
+
+def load_discovery_document() -> str:
+    """
+    Returns the Gmail v1 discovery document from the on-disk cache, seeding the cache from
+    the copy bundled with google-api-python-client (or, failing that, the network).
+    """
+    try:
+        with open(DISCOVERY_CACHE_PATH) as cache_file:
+            return cache_file.read()
+    except OSError:
+        pass
+
+    document = get_static_doc("gmail", "v1")
+    if document is None:
+        logging.info("🌐 Downloading Gmail discovery document...")
+        document = build("gmail", "v1", static_discovery=False)._rootDesc
+        document = json.dumps(document)
+
+    try:
+        with open(DISCOVERY_CACHE_PATH, "w") as cache_file:
+            cache_file.write(document)
+    except OSError as e:
+        logging.warning(f"⚠️ Could not cache discovery document at {DISCOVERY_CACHE_PATH}: {e}")
+    return document
+
+
 class GmailService:
     """
     A service for interacting with the Gmail API to fetch and parse emails.
     """
-    def __init__(self, token_path: str = "token.json"):
+    def __init__(self, token_path: str = "token.json", max_workers: int = DEFAULT_MAX_WORKERS,
+                 root_url: str = GMAIL_API_ROOT):
         """
         Initializes the Gmail service with the provided token file.
+        `max_workers` bounds how many batch requests run concurrently.
+        `root_url` overrides the API host, e.g. to run against the offline fake server.
+        The API client is built from a cached discovery document, so no network call is made here.
         """
-        self.creds = Credentials.from_authorized_user_file(
-            token_path,
-            ["https://www.googleapis.com/auth/gmail.readonly"]
-        )
-        self.service = build("gmail", "v1", credentials=self.creds)
+        self.token_path = token_path
+        self.creds = Credentials.from_authorized_user_file(token_path, SCOPES)
+        self.token_mtime = os.path.getmtime(token_path)
+        document = json.loads(load_discovery_document())
+        if root_url:
+            root_url = root_url.rstrip("/") + "/"
+            document["rootUrl"] = document["mtlsRootUrl"] = root_url
+            document["baseUrl"] = root_url + document.get("servicePath", "")
+        self.service = build_from_document(document, credentials=self.creds)
+        self.max_workers = max_workers
+        self._local = threading.local()
+        self._creds_lock = threading.Lock()
+        # Long-lived pool so worker threads (and their HTTP connections) are reused across fetches
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="gmail-fetch")
+
+    @property
+    def last_fetch_stats(self) -> dict:
+        """
+        Stats of the most recent fetch run on the calling thread; kept per thread
+        because one GmailService is shared by every request and scheduler task.
+        """
+        return getattr(self._local, "last_fetch_stats", {})
+
+    @last_fetch_stats.setter
+    def last_fetch_stats(self, value: dict):
+        self._local.last_fetch_stats = value
+
+    def ensure_fresh_credentials(self):
+        """
+        Refreshes the access token ahead of expiry (within TOKEN_REFRESH_MARGIN) and
+        persists it, so requests never stall on a refresh mid-batch.
+        """
+        with self._creds_lock:
+            expiry = self.creds.expiry
+            if self.creds.valid and expiry and expiry - datetime.utcnow() > TOKEN_REFRESH_MARGIN:
+                return
+            if not self.creds.refresh_token:
+                return
+            logging.info("🔑 Refreshing Gmail access token...")
+            self.creds.refresh(Request())
+            try:
+                # Under the shared lock, so get_gmail_service never sees our own write
+                # as a replaced token file and rebuilds the client
+                with _shared_service_lock:
+                    with open(self.token_path, "w") as token_file:
+                        token_file.write(self.creds.to_json())
+                    self.token_mtime = os.path.getmtime(self.token_path)
+            except OSError as e:
+                logging.warning(f"⚠️ Could not persist refreshed token to {self.token_path}: {e}")
+
+    def close(self):
+        """
+        Stops the fetch worker pool. Only for services no other thread can still be using.
+        """
+        self._pool.shutdown(wait=False)
 
     def get_unread_email_count(self) -> int:
         """
-        Returns the actual number of unread emails by paginating through all results.
+        Returns the number of unread emails anywhere in the mailbox, read from the
+        UNREAD system label's counters in a single call.
         """
-        total = 0
+        return self.get_label_counts(["UNREAD"])["UNREAD"]["messagesTotal"]
+
+    def get_label_counts(self, label_ids) -> dict:
+        """
+        Returns Gmail's own message counters for the given labels.
+
+        Returns:
+            dict: {label_id: {"messagesTotal": int, "messagesUnread": int}}
+        """
+        counts = {}
+        for label_id in label_ids:
+            label = self._execute(self.service.users().labels().get(userId="me", id=label_id), "labels.get")
+            counts[label_id] = {
+                "messagesTotal": label.get("messagesTotal", 0),
+                "messagesUnread": label.get("messagesUnread", 0),
+            }
+        return counts
+
+    def get_history_id(self) -> str:
+        """
+        Returns the mailbox's current historyId, used as the incremental sync checkpoint.
+        """
+        profile = self._execute(self.service.users().getProfile(userId="me"), "getProfile")
+        return profile["historyId"]
+
+    def list_history(self, start_history_id: str, track_labels=("INBOX", "UNREAD")) -> dict:
+        """
+        Lists mailbox changes since the given historyId. Also derives how the
+        messagesTotal/messagesUnread counters of `track_labels` moved over the window.
+
+        Returns:
+            dict: {"added": [ids], "deleted": [ids], "changed": [ids], "history_id": str,
+                   "label_deltas": {label_id: {"messagesTotal": int, "messagesUnread": int}}}
+
+        Raises:
+            HistoryExpiredError: If Gmail no longer has history for start_history_id.
+        """
+        added, deleted, changed = {}, {}, {}
+        label_deltas = {label: {"messagesTotal": 0, "messagesUnread": 0} for label in track_labels}
+        history_id = start_history_id
+
+        def count_change(before, after):
+            for label, delta in label_deltas.items():
+                delta["messagesTotal"] += (label in after) - (label in before)
+                delta["messagesUnread"] += (
+                    (label in after and "UNREAD" in after) - (label in before and "UNREAD" in before)
+                )
         page_token = None
 
         while True:
-            response = self.service.users().messages().list(
-                userId="me",
-                q="is:unread in:anywhere",
-                pageToken=page_token,
-                maxResults=500
-            ).execute()
+            try:
+                response = self._execute(self.service.users().history().list(
+                    userId="me",
+                    startHistoryId=start_history_id,
+                    historyTypes=["messageAdded", "messageDeleted", "labelAdded", "labelRemoved"],
+                    pageToken=page_token
+                ), "history.list")
+            except HttpError as e:
+                if e.resp.status == 404:
+                    raise HistoryExpiredError(f"History {start_history_id} is no longer available") from e
+                raise
 
-            messages = response.get("messages", [])
-            total += len(messages)
+            for record in response.get("history", []):
+                for entry in record.get("messagesAdded", []):
+                    message = entry["message"]
+                    labels = set(message.get("labelIds", []))
+                    count_change(set(), labels)
+                    if not EXCLUDED_HISTORY_LABELS.intersection(labels):
+                        added[message["id"]] = True
+                for entry in record.get("messagesDeleted", []):
+                    count_change(set(entry["message"].get("labelIds", [])), set())
+                    deleted[entry["message"]["id"]] = True
+                for entry in record.get("labelsAdded", []):
+                    after = set(entry["message"].get("labelIds", []))
+                    count_change(after - set(entry.get("labelIds", [])), after)
+                    changed[entry["message"]["id"]] = not EXCLUDED_HISTORY_LABELS.intersection(after)
+                for entry in record.get("labelsRemoved", []):
+                    after = set(entry["message"].get("labelIds", []))
+                    count_change(after | set(entry.get("labelIds", [])), after)
+                    changed[entry["message"]["id"]] = not EXCLUDED_HISTORY_LABELS.intersection(after)
 
+            history_id = response.get("historyId", history_id)
             page_token = response.get("nextPageToken")
             if not page_token:
                 break
 
-        return total
+        # A message added and deleted within the same window never needs fetching
+        for msg_id in deleted:
+            added.pop(msg_id, None)
+            changed.pop(msg_id, None)
 
-    def fetch_emails(self, since: str = None, unread_only: bool = False, max_results: int = 100):
+        logging.info(
+            f"🕰️ History since {start_history_id}: {len(added)} added, "
+            f"{len(deleted)} deleted, {len(changed)} changed (now at {history_id})"
+        )
+        return {
+            "added": list(added),
+            "deleted": list(deleted),
+            # Latest state wins: a message whose last change moved it to spam/trash is not wanted
+            "changed": [msg_id for msg_id, visible in changed.items() if visible and msg_id not in added],
+            "history_id": history_id,
+            "label_deltas": label_deltas,
+        }
+
+    def build_query(self, since: str = None, unread_only: bool = False, after_timestamp: int = None) -> str:
         """
-        Fetches emails from the Gmail API based on the provided filters.
+        Builds a Gmail search query from the fetch filters.
 
         Args:
-            since (str): Fetch emails received after this date.
-            unread_only (bool): Whether to fetch only unread emails.
-            max_results (int): Maximum number of emails to fetch.
-
-        Returns:
-            list: A list of parsed email data.
+            since (str): Emails received after local midnight of this date (%Y-%m-%d).
+            unread_only (bool): Whether to match only unread emails.
+            after_timestamp (int): Emails received after this UTC epoch second (overrides `since`).
         """
         query_parts = []
 
+        if after_timestamp is not None:
+            query_parts.append(f"after:{int(after_timestamp)}")
+            since = None
+
         if since:
             local_tz = pytz.timezone("America/Los_Angeles")
             since_date = datetime.strptime(since, "%Y-%m-%d")
@@ -76,84 +303,316 @@ class GmailService:
         if unread_only:
             query_parts.append("is:unread")
 
-        query = " ".join(query_parts)
+        return " ".join(query_parts)
+
+    def iter_emails(self, since: str = None, unread_only: bool = False, page_size: int = 100,
+                    batch_size: int = DEFAULT_BATCH_SIZE, profile: str = DEFAULT_FETCH_PROFILE,
+                    after_timestamp: int = None, query: str = None, page_token: str = None,
+                    exclude=None):
+        """
+        Lists matching messages one page at a time and yields each page as soon as it is parsed,
+        so memory stays bounded by the page size regardless of how many emails match.
+        Run totals accumulate in `last_fetch_stats` as pages are yielded, including
+        `failed_ids`: messages still failing after all retries, in the order they failed,
+        which callers must retry before treating a page as complete.
+
+        Args:
+            since, unread_only, after_timestamp: Filters passed to build_query.
+            page_size (int): Message ids listed per messages.list call (max 500).
+            batch_size (int): Number of message gets grouped into one batch request.
+            profile (str): Fetch profile name from FETCH_PROFILES.
+            query (str): Raw Gmail search query, used instead of the filters when given.
+            page_token (str): messages.list page token to resume from.
+            exclude (callable): Given a page of listed ids, returns the ids to skip downloading
+                (e.g. ids already stored). Skipped ids are counted in `last_fetch_stats["skipped"]`.
+
+        Yields:
+            tuple: (list of parsed email data, next page token or None when this was the last page).
+        """
+        if query is None:
+            query = self.build_query(since=since, unread_only=unread_only, after_timestamp=after_timestamp)
         logging.info(f"📨 Fetching emails with query: '{query}'")
 
-        messages = []
-        try:
-            # Fetch messages from Gmail
-            response = self.service.users().messages().list(
-                userId="me", q=query, maxResults=max_results
-            ).execute()
-
-            batch = response.get('messages', [])
-            messages.extend(batch)
-            logging.info(f"📦 Fetched {len(batch)} messages (initial batch)")
-
-            # Handle pagination
-            while 'nextPageToken' in response:
-                response = self.service.users().messages().list(
-                    userId="me", q=query, pageToken=response['nextPageToken']
-                ).execute()
-                batch = response.get('messages', [])
-                messages.extend(batch)
-                logging.info(f"➕ Fetched {len(batch)} more messages (paginated) out of {len(messages)} total)")
-
-        except HttpError as e:
-            logging.error(f"❌ Gmail API error: {e}")
-            raise Exception(f"Gmail API error: {e}")
-
-        # Parse email metadata
+        run_stats = {
+            "profile": profile, "messages": 0, "failed": 0, "bytes": 0,
+            "bytes_per_message": 0, "retries": 0, "throttled": 0, "skipped": 0, "failed_ids": [],
+        }
+        self.last_fetch_stats = dict(run_stats)
+        listed = 0
+
+        while True:
+            try:
+                response = self._execute(self.service.users().messages().list(
+                    userId="me", q=query, maxResults=page_size, pageToken=page_token
+                ), "messages.list", run_stats)
+            except HttpError as e:
+                logging.error(f"❌ Gmail API error: {e}")
+                raise Exception(f"Gmail API error: {e}")
+
+            ids = [msg['id'] for msg in response.get('messages', [])]
+            listed += len(ids)
+            page_token = response.get('nextPageToken')
+            if exclude and ids:
+                known = exclude(ids)
+                ids = [msg_id for msg_id in ids if msg_id not in known]
+                run_stats["skipped"] += len(known)
+            logging.info(f"📦 Listed {listed} messages so far, {len(ids)} new on this page")
+
+            email_data, failed = self.fetch_messages(ids, batch_size=batch_size, profile=profile) if ids else ([], [])
+            if failed:
+                logging.warning(f"⚠️ {len(failed)} messages could not be fetched: {failed[:10]}")
+                run_stats["failed_ids"] = run_stats["failed_ids"] + failed
+
+            page_stats = self.last_fetch_stats if ids else {}
+            for key in ("messages", "failed", "bytes", "retries", "throttled"):
+                run_stats[key] += page_stats.get(key, 0)
+            if run_stats["messages"]:
+                run_stats["bytes_per_message"] = round(run_stats["bytes"] / run_stats["messages"])
+            self.last_fetch_stats = dict(run_stats)
+
+            yield email_data, page_token
+
+            if not page_token:
+                break
+
+        logging.info(
+            f"📬 Total parsed emails: {run_stats['messages']} "
+            f"(profile={profile}, {run_stats['bytes_per_message']} bytes/message, "
+            f"{run_stats['retries']} retries, {run_stats['throttled']} throttled, "
+            f"{run_stats['skipped']} already stored, {run_stats['failed']} failed)"
+        )
+
+    def fetch_emails(self, since: str = None, unread_only: bool = False, max_results: int = 100,
+                     batch_size: int = DEFAULT_BATCH_SIZE, profile: str = DEFAULT_FETCH_PROFILE,
+                     after_timestamp: int = None, exclude=None):
+        """
+        Fetches emails from the Gmail API based on the provided filters.
+        Collects every page from iter_emails; prefer iter_emails for large ranges.
+
+        Args:
+            since (str): Fetch emails received after this date.
+            unread_only (bool): Whether to fetch only unread emails.
+            max_results (int): Number of message ids listed per page.
+            batch_size (int): Number of message gets grouped into one batch request.
+            profile (str): Fetch profile name from FETCH_PROFILES.
+            after_timestamp (int): Fetch emails received after this UTC epoch second (overrides `since`).
+            exclude (callable): Returns the ids from a listed page that should not be downloaded.
+
+        Returns:
+            list: A list of parsed email data.
+        """
         email_data = []
+        for page, _ in self.iter_emails(since=since, unread_only=unread_only, page_size=max_results,
+                                        batch_size=batch_size, profile=profile,
+                                        after_timestamp=after_timestamp, exclude=exclude):
+            email_data.extend(page)
+        return email_data
+
+    def fetch_messages(self, message_ids, batch_size: int = DEFAULT_BATCH_SIZE,
+                       profile: str = DEFAULT_FETCH_PROFILE):
+        """
+        Fetches and parses messages using Gmail HTTP batch requests spread over a bounded
+        worker pool. Every batch is paced by the shared quota token bucket, and rate-limited
+        or transient failures are retried with exponential backoff instead of being dropped.
+        Records message, byte, retry and throttle counts for the run in `last_fetch_stats`.
+
+        Args:
+            message_ids (list): Gmail message ids to fetch.
+            batch_size (int): Number of message gets grouped into one batch request (max 100).
+            profile (str): Fetch profile name from FETCH_PROFILES.
+
+        Returns:
+            tuple: (list of parsed email data in input order, list of ids that failed).
+        """
+        if profile not in FETCH_PROFILES:
+            raise ValueError(f"Unknown fetch profile '{profile}'. Expected one of {sorted(FETCH_PROFILES)}")
+        batch_size = max(1, min(batch_size, MAX_BATCH_SIZE))
+        chunks = [message_ids[start:start + batch_size] for start in range(0, len(message_ids), batch_size)]
+
+        parsed = {}
+        failed = []
+        run_stats = {"bytes": 0, "retries": 0, "throttled": 0}
+        total = len(message_ids)
+        done = 0
+
+        futures = [self._pool.submit(self._fetch_chunk, chunk, profile) for chunk in chunks]
+        for future in as_completed(futures):
+            chunk_parsed, chunk_failed, chunk_stats = future.result()
+            parsed.update(chunk_parsed)
+            failed.extend(chunk_failed)
+            for key in run_stats:
+                run_stats[key] += chunk_stats[key]
+
+            done += len(chunk_parsed) + len(chunk_failed)
+            logging.info(f"📦 Parsed {done}/{total} messages ({(done / total) * 100:.1f}%)...")
 
-        # # Print the first email record (if available) before parsing
-        # if messages:
-        #     first_msg_id = messages[0]['id']
-        #     try:
-        #         first_msg_data = self.service.users().messages().get(
-        #             userId='me', id=first_msg_id,
-        #             format='full',
-        #             metadataHeaders=['From', 'Subject']
-        #         ).execute()
-        #         logging.info(f"🔍 First email record before parsing: {first_msg_data}")
-        #     except Exception as e:
-        #         logging.warning(f"⚠️ Failed to fetch first message {first_msg_id}: {e}")
-
-        logging.info(f"📬 Parsing {len(messages)} messages...")
-        for idx, msg in enumerate(messages, 1):
+        self.last_fetch_stats = {
+            "profile": profile,
+            "messages": len(parsed),
+            "failed": len(failed),
+            "failed_ids": failed,
+            "bytes": run_stats["bytes"],
+            "bytes_per_message": round(run_stats["bytes"] / len(parsed)) if parsed else 0,
+            "retries": run_stats["retries"],
+            "throttled": run_stats["throttled"],
+        }
+        if run_stats["retries"]:
+            logging.info(f"🔁 {run_stats['retries']} retries ({run_stats['throttled']} rate-limited) while fetching")
+        return [parsed[msg_id] for msg_id in message_ids if msg_id in parsed], failed
+
+    def _fetch_chunk(self, chunk, profile: str):
+        """
+        Fetches one batch of messages, retrying the retryable subset until it succeeds
+        or MAX_RETRIES is exhausted. Runs on a worker thread with its own HTTP connection.
+
+        Returns:
+            tuple: (dict of id -> parsed email, list of failed ids, stats dict)
+        """
+        get_params = FETCH_PROFILES[profile]
+        parsed = {}
+        failed = []
+        stats = {"bytes": 0, "retries": 0, "throttled": 0}
+        pending = list(chunk)
+        attempt = 0
+
+        while pending:
+            retry = []
+            throttled = 0
+
+            def on_response(request_id, response, exception):
+                nonlocal throttled
+                if exception is not None:
+                    if is_retryable(exception):
+                        retry.append(request_id)
+                        throttled += is_rate_limited(exception)
+                    else:
+                        logging.warning(f"⚠️ Failed to fetch message {request_id}: {exception}")
+                        failed.append(request_id)
+                    return
+                # Size of the decoded JSON resource, which is what the partial-response mask trims
+                stats["bytes"] += len(json.dumps(response, separators=(",", ":")))
+                try:
+                    parsed[request_id] = self._parse_message(response)
+                except Exception as e:
+                    logging.warning(f"⚠️ Failed to parse message {request_id}: {e}")
+                    failed.append(request_id)
+
+            batch = self.service.new_batch_http_request(callback=on_response)
+            for msg_id in pending:
+                batch.add(
+                    self.service.users().messages().get(userId='me', id=msg_id, **get_params),
+                    request_id=msg_id
+                )
+
+            GMAIL_QUOTA.acquire(QUOTA_UNITS["messages.get"] * len(pending))
             try:
-                msg_data = self.service.users().messages().get(
-                    userId='me', id=msg['id'],
-                    format='full',
-                    metadataHeaders=['From', 'Subject']
-                ).execute()
-
-                headers = {h['name']: h['value'] for h in msg_data['payload']['headers']}
-                sender_raw = headers.get('From', 'Unknown')
-                subject = headers.get('Subject', '(No Subject)')
-
-                sender_name, sender_email = parseaddr(sender_raw)
-                if not sender_name:
-                    sender_name = sender_email
-
-                timestamp = int(msg_data.get("internalDate", 0)) / 1000
-                received_at = datetime.utcfromtimestamp(timestamp).isoformat()
-
-                body = msg_data.get("snippet", "")  # Use snippet as body
-
-                email_data.append({
-                    "id": msg['id'],
-                    "sender": sender_name,
-                    "email": sender_email,
-                    "subject": subject,
-                    "body": body,
-                    "received_at": received_at
-                })
+                batch.execute(http=self._http())
+            except Exception as e:
+                if not is_retryable(e):
+                    logging.error(f"❌ Gmail batch request failed: {e}")
+                    failed.extend(msg_id for msg_id in pending if msg_id not in parsed and msg_id not in failed)
+                    break
+                retry = [msg_id for msg_id in pending if msg_id not in parsed and msg_id not in failed]
+                throttled = len(retry) if is_rate_limited(e) else 0
+
+            if not retry:
+                break
 
+            attempt += 1
+            if attempt > MAX_RETRIES:
+                logging.error(f"❌ Giving up on {len(retry)} messages after {MAX_RETRIES} retries")
+                failed.extend(retry)
+                break
+
+            stats["retries"] += len(retry)
+            stats["throttled"] += throttled
+            delay = backoff_delay(attempt)
+            logging.warning(f"⏳ Retrying {len(retry)} messages in {delay:.1f}s (attempt {attempt}/{MAX_RETRIES})")
+            sleep(delay)
+            pending = retry
+
+        return parsed, failed, stats
+
+    def _execute(self, request, method: str, stats: dict = None):
+        """
+        Executes a single API request on this thread's HTTP connection, paced by the
+        quota token bucket and retried with backoff on rate limits and transient errors.
+        Retry and throttle counts are added to `stats` when given.
+        """
+        attempt = 0
+        while True:
+            GMAIL_QUOTA.acquire(QUOTA_UNITS[method])
+            try:
+                return request.execute(http=self._http())
             except Exception as e:
-                logging.warning(f"⚠️ Failed to parse message {msg.get('id')}: {e}")
+                attempt += 1
+                if not is_retryable(e) or attempt > MAX_RETRIES:
+                    raise
+                if stats is not None:
+                    stats["retries"] = stats.get("retries", 0) + 1
+                    stats["throttled"] = stats.get("throttled", 0) + is_rate_limited(e)
+                delay = backoff_delay(attempt)
+                logging.warning(f"⏳ {method} failed ({e}); retrying in {delay:.1f}s (attempt {attempt}/{MAX_RETRIES})")
+                sleep(delay)
 
-            if idx % 100 == 0 or idx == len(messages):
-                logging.info(f"📦 Parsed {idx}/{len(messages)} messages ({(idx / len(messages)) * 100:.1f}%)...")
-        logging.info(f"📬 Total parsed emails: {len(email_data)}")
-        return email_data
+    def _http(self):
+        """
+        Returns this thread's authorized HTTP connection. httplib2 connections are not
+        thread-safe, so every worker thread gets (and keeps reusing) its own.
+        """
+        http = getattr(self._local, "http", None)
+        if http is None:
+            http = AuthorizedHttp(self.creds, http=httplib2.Http(timeout=HTTP_TIMEOUT_SECONDS))
+            self._local.http = http
+        return http
+
+    @staticmethod
+    def _parse_message(msg_data: dict) -> dict:
+        """
+        Extracts sender, subject, snippet and received time from a Gmail message resource.
+        """
+        headers = {h['name']: h['value'] for h in msg_data.get('payload', {}).get('headers', [])}
+        sender_raw = headers.get('From', 'Unknown')
+        subject = headers.get('Subject', '(No Subject)')
+
+        sender_name, sender_email = parseaddr(sender_raw)
+        if not sender_name:
+            sender_name = sender_email
+
+        timestamp = int(msg_data.get("internalDate", 0)) / 1000
+        received_at = datetime.utcfromtimestamp(timestamp).isoformat()
+
+        body = msg_data.get("snippet", "")  # Use snippet as body
+
+        return {
+            "id": msg_data['id'],
+            "sender": sender_name,
+            "email": sender_email,
+            "subject": subject,
+            "body": body,
+            "received_at": received_at
+        }
+
+
+_shared_service = None
+_shared_service_lock = threading.Lock()
+
+
+def get_gmail_service(token_path: str = TOKEN_PATH) -> GmailService:
+    """
+    Returns the process-wide GmailService, building it on first use and rebuilding it
+    when the token file is replaced (e.g. after re-authorizing). Credentials are
+    refreshed proactively before the service is handed out.
+    """
+    global _shared_service
+    with _shared_service_lock:
+        service = _shared_service
+        if (service is None or service.token_path != token_path
+                or os.path.getmtime(token_path) != service.token_mtime):
+            # The old client is not closed: requests already holding it keep using its
+            # pool, which is released once the last of them drops the reference.
+            logging.info(f"🔌 Building shared Gmail client from {token_path}")
+            service = GmailService(token_path=token_path)
+            _shared_service = service
+    service.ensure_fresh_credentials()
+    return service
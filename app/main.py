@@ -10,11 +10,15 @@ import asyncio
 from datetime import datetime, timedelta
 
 from app.routers import gmail, openai_routes, system
-from app.utils.database import initialize_database, get_db_path, save_system_value
+from app.utils.database import initialize_database, get_db_path, save_system_value, close_all_connections
 from app.utils.automations import fetch_last_hour_emails, midnight_task, check_and_retrain_model
+from app.utils.backfill import resume_backfill_jobs
+from app.utils.write_queue import WRITE_QUEUE
+from app.utils.prediction_telemetry import PREDICTION_TELEMETRY
+from app.utils.mailbox_counters import refresh_mailbox_counters_if_stale, get_unread_count
 from app.routers.gmail.reputation import recalculate_all_sender_reputations
 
-from app.gmail_service import GmailService
+from app.gmail_service import get_gmail_service
 
 logging.getLogger("httpx").setLevel(logging.WARNING)
 # Configure logging to include timestamps
@@ -33,6 +37,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # DB
@@ -70,15 +75,13 @@ async def start_schedulers():
                 logging.info("⏰ Running scheduled fetch for last hour...")
                 fetch_last_hour_emails()  # Call directly since it's sync
 
-                gmail_service = GmailService(token_path="/data/token.json")
+                gmail_service = get_gmail_service()
                 loop = asyncio.get_running_loop()
-                count = await loop.run_in_executor(
-                    thread_pool, gmail_service.get_unread_email_count
-                )  # ✅ now works with self
+                # Counters follow sync deltas; Gmail is only asked again once they go stale
                 await loop.run_in_executor(
-                    thread_pool, save_system_value, "unread_email_count", count
+                    thread_pool, refresh_mailbox_counters_if_stale, gmail_service
                 )
-                logging.info(f"📬 Unread email count: {count}")
+                logging.info(f"📬 Unread email count: {get_unread_count()['unread']}")
 
             except Exception as e:
                 logging.error(f"⚠️ Scheduled fetch failed: {e}")
@@ -113,7 +116,17 @@ async def start_schedulers():
             except Exception as e:
                 logging.error(f"❌ Reputation recalculation failed: {e}")
 
+    # Pick up backfill jobs interrupted by the last shutdown
+    await asyncio.get_running_loop().run_in_executor(thread_pool, resume_backfill_jobs)
+
     asyncio.create_task(periodic_fetch())
     # asyncio.create_task(midnight_task_runner())
     # asyncio.create_task(friday_reputation_recalculation())
 
+
+@app.on_event("shutdown")
+def close_database_connections():
+    # Commit queued writes and telemetry first, then checkpoint the WAL and release every pooled connection
+    PREDICTION_TELEMETRY.flush()
+    WRITE_QUEUE.stop()
+    close_all_connections()
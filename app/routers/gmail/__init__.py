@@ -8,6 +8,9 @@ from .list import router as list_router
 from .stats import router as stats_router
 from .classify import router as classify_router
 from .reputation import router as reputation_router
+from .backfill import router as backfill_router
+from .search import router as search_router
+from .backup import router as backup_router
 
 # Combine all Gmail-related routers into a single router
 router = APIRouter()
@@ -16,5 +19,8 @@ router.include_router(list_router)
 router.include_router(stats_router)
 router.include_router(classify_router)
 router.include_router(reputation_router)
+router.include_router(backfill_router)
+router.include_router(search_router)
+router.include_router(backup_router)
 
 __all__ = ["router"]
@@ -0,0 +1,71 @@
+# Standard library imports
+import logging
+
+# Third-party imports
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+# Application-specific imports
+from app.utils.backfill import (
+    DEFAULT_WINDOW_DAYS,
+    create_backfill_job,
+    start_backfill_job,
+    get_backfill_job,
+    list_backfill_jobs,
+)
+
+# Initialize router
+router = APIRouter()
+
+@router.post("/backfill")
+def start_backfill(days: int = 90, window_days: int = DEFAULT_WINDOW_DAYS, refresh: bool = False):
+    """
+    Start a resumable backfill of the last `days` days (excluding today), processed
+    in parallel `window_days` windows on a background thread.
+    """
+    try:
+        job_id = create_backfill_job(days, window_days=window_days, refresh=refresh)
+        try:
+            start_backfill_job(job_id)
+        except RuntimeError as e:
+            return JSONResponse(status_code=409, content={"error": str(e), "job_id": job_id})
+        return JSONResponse({"status": "started", "job_id": job_id})
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    except Exception as e:
+        logging.error(f"❌ Failed to start backfill: {e}")
+        return JSONResponse(status_code=500, content={"error": str(e)})
+
+@router.get("/backfill")
+def list_backfills():
+    """
+    List recent backfill jobs with progress and ETA.
+    """
+    try:
+        return JSONResponse({"jobs": list_backfill_jobs()})
+    except Exception as e:
+        logging.error(f"❌ Failed to list backfill jobs: {e}")
+        return JSONResponse(status_code=500, content={"error": str(e)})
+
+@router.get("/backfill/{job_id}")
+def get_backfill(job_id: int):
+    """
+    Return a backfill job with per-window page tokens, progress and ETA.
+    """
+    job = get_backfill_job(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"error": f"Backfill job {job_id} not found"})
+    return JSONResponse(job)
+
+@router.post("/backfill/{job_id}/resume")
+def resume_backfill(job_id: int):
+    """
+    Resume a failed or interrupted backfill job from its saved page tokens.
+    """
+    if get_backfill_job(job_id) is None:
+        return JSONResponse(status_code=404, content={"error": f"Backfill job {job_id} not found"})
+    try:
+        started = start_backfill_job(job_id)
+    except RuntimeError as e:
+        return JSONResponse(status_code=409, content={"error": str(e)})
+    return JSONResponse({"status": "started" if started else "already_running", "job_id": job_id})
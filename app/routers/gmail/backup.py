@@ -0,0 +1,61 @@
+# Standard library imports
+import logging
+
+# Third-party imports
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+# Application-specific imports
+from app.utils.backup import create_backup, list_backups, restore_backup
+
+# Initialize router
+router = APIRouter()
+
+@router.post("/debug/backup")
+def backup_database():
+    """
+    Takes a compressed online snapshot of the database; writers keep running meanwhile.
+    """
+    try:
+        result = create_backup()
+        return JSONResponse({
+            "status": "success",
+            "message": f"Backup {result['name']} created ({result['size_bytes']} bytes).",
+            **result
+        })
+    except RuntimeError as e:
+        return JSONResponse(status_code=409, content={"error": str(e)})
+    except Exception as e:
+        logging.error(f"❌ Backup failed: {e}")
+        return JSONResponse(status_code=500, content={"error": str(e)})
+
+@router.get("/debug/backups")
+def get_backups():
+    """
+    Lists stored snapshots, newest first.
+    """
+    try:
+        return JSONResponse({"backups": list_backups()})
+    except Exception as e:
+        logging.error(f"❌ Failed to list backups: {e}")
+        return JSONResponse(status_code=500, content={"error": str(e)})
+
+@router.post("/debug/restore")
+def restore_database(name: str = None):
+    """
+    Restores the named snapshot (the newest by default) after verifying its integrity.
+    """
+    try:
+        result = restore_backup(name)
+        return JSONResponse({
+            "status": "success",
+            "message": f"Database restored from {result['restored']}.",
+            **result
+        })
+    except FileNotFoundError as e:
+        return JSONResponse(status_code=404, content={"error": str(e)})
+    except RuntimeError as e:
+        return JSONResponse(status_code=409, content={"error": str(e)})
+    except Exception as e:
+        logging.error(f"❌ Restore failed: {e}")
+        return JSONResponse(status_code=500, content={"error": str(e)})
@@ -1,5 +1,4 @@
 # Standard library imports
-import sqlite3
 import logging
 import json
 
@@ -8,10 +7,10 @@ from fastapi import APIRouter
 from fastapi.responses import JSONResponse
 
 # Application-specific imports
-from app.utils.database import get_db_path, update_sender_reputation
+from app.utils.listing import MANUAL_REVIEW_COLUMNS, list_email_page
+from app.utils.write_queue import queue_manual_label
 
 router = APIRouter()
-db_path = get_db_path()
 
 from fastapi import Request
 from pydantic import BaseModel
@@ -23,59 +22,52 @@ class EmailUpdateRequest(BaseModel):
 @router.post("/manual-review/update-label")
 def update_email_label(payload: EmailUpdateRequest):
     try:
-        conn = sqlite3.connect(get_db_path())
-        cursor = conn.cursor()
-
-        cursor.execute("""
-            UPDATE emails
-            SET category = ?, manual_override = 1, override_timestamp = CURRENT_TIMESTAMP
-            WHERE id = ?
-        """, (payload.new_label, payload.id))
-
-        conn.commit()
-        conn.close()
+        # Committed by the background writer within WRITE_FLUSH_INTERVAL_SECONDS
+        queue_manual_label(payload.id, payload.new_label)
         return {"status": "updated", "id": payload.id, "label": payload.new_label}
     except Exception as e:
         logging.error(f"❌ Failed to update label: {e}")
         return JSONResponse(status_code=500, content={"error": str(e)})
 
 
-@router.get("/manual-review")
-def get_emails_for_manual_classification(tab: str = "flagged"):
-    conn = sqlite3.connect(get_db_path())
-    cursor = conn.cursor()
-
-    if tab == "flagged":
-        where_clause = "category = 'Flagged For Review'"
-    elif tab == "suspected":
-        where_clause = "category = 'Suspected Spam'"
-    elif tab == "reviewed":
-        where_clause = "category NOT IN ('Flagged for Review', 'Suspected Spam') AND predicted_by IS NOT NULL"
-    else:
-        where_clause = "1=1"  # fallback: return all
+# Filters for each manual-review tab; anything else returns all emails
+MANUAL_REVIEW_TABS = {
+    "flagged": {"category": "Flagged For Review"},
+    "suspected": {"category": "Suspected Spam"},
+    "reviewed": {"exclude_categories": ("Flagged for Review", "Suspected Spam"), "require_predicted_by": True},
+}
 
-    cursor.execute(f"""
-        SELECT id, sender, subject, body, sender_email, category, predicted_by, confidence
-        FROM emails
-        WHERE {where_clause}
-        ORDER BY received_at DESC
-        LIMIT 100
-    """)
+@router.get("/manual-review")
+def get_emails_for_manual_classification(tab: str = "flagged", cursor: str = None, limit: int = 100,
+                                         sender: str = None, predicted_by: str = None,
+                                         min_confidence: float = None, max_confidence: float = None):
+    """
+    Lists emails for a manual-review tab, newest first. The body stays a plain list;
+    the cursor for the next page is returned in the X-Next-Cursor header.
+    """
+    try:
+        page = list_email_page(
+            cursor=cursor, limit=limit, sender=sender, predicted_by=predicted_by,
+            min_confidence=min_confidence, max_confidence=max_confidence, columns=MANUAL_REVIEW_COLUMNS,
+            **MANUAL_REVIEW_TABS.get(tab, {})
+        )
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
 
     emails = [
         {
-            "id": row[0],
-            "sender": row[1],
-            "subject": row[2],
-            "snippet": (row[3] or "")[:100],
-            "sender_email": row[4],
-            "suggested": row[5],
-            "predicted_by": row[6],
-            "confidence": row[7] or 0
+            "id": email["id"],
+            "sender": email["sender"],
+            "subject": email["subject"],
+            "snippet": email["snippet"] or "",
+            "sender_email": email["sender_email"],
+            "suggested": email["category"],
+            "predicted_by": email["predicted_by"],
+            "confidence": email["confidence"] or 0
         }
-        for row in cursor.fetchall()
+        for email in page["emails"]
     ]
 
-    conn.close()
-    logging.info(f"Fetched {len(emails)} emails for manual classification in tab '{tab}'")  
-    return emails
+    logging.info(f"Fetched {len(emails)} emails for manual classification in tab '{tab}'")
+    headers = {"X-Next-Cursor": page["next_cursor"]} if page["next_cursor"] else None
+    return JSONResponse(emails, headers=headers)
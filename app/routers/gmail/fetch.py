@@ -1,6 +1,5 @@
 # Standard library imports
 from datetime import datetime, time, timedelta
-import sqlite3
 import logging
 import time
 
@@ -12,23 +11,35 @@ from fastapi import APIRouter
 from fastapi.responses import JSONResponse
 
 # Application-specific imports
-from app.gmail_service import GmailService
-from app.utils.database import get_db_path
+from app.gmail_service import get_gmail_service
+from app.utils.database import get_email_counters, get_existing_email_ids
+from app.utils.ingest import ingest_email_pages
+from app.utils.backfill import create_backfill_job, start_backfill_job
 from app.utils.classifier import classify_email_batch
 from app.utils.automations import run_full_classification_pipeline
+from app.utils.write_queue import WRITE_QUEUE
 
 # Initialize router
 router = APIRouter()
-db_path = get_db_path()
+
+# How long a request waits for its queued classification results to be committed
+WRITE_FLUSH_TIMEOUT_SECONDS = 30
+
+def _write_backlog_response():
+    return JSONResponse(
+        status_code=503,
+        content={"error": f"Queued classification writes were not committed within {WRITE_FLUSH_TIMEOUT_SECONDS}s"}
+    )
 
 @router.get("/")
 async def fetch_emails():
     return {"message": "Fetching emails"}
 
 @router.get("/fetch")
-def fetch_emails_since_midnight():
+def fetch_emails_since_midnight(refresh: bool = False):
     """
     Fetch unread emails since local midnight and insert them into the database.
+    Already stored emails are skipped unless `refresh` is set.
     """
     try:
         # Calculate midnight in local timezone using timedelta
@@ -37,156 +48,76 @@ def fetch_emails_since_midnight():
         local_midnight = (now_local - timedelta(hours=now_local.hour, minutes=now_local.minute, seconds=now_local.second, microseconds=now_local.microsecond))
         query_date = local_midnight.strftime("%Y-%m-%d")
 
-        # Fetch emails using GmailService
-        gmail = GmailService(token_path="/data/token.json")
-        emails = gmail.fetch_emails(since=query_date, unread_only=True)
-        logging.info(f"📥 Fetched {len(emails)} emails")
-
-        # Insert emails into the database
-        conn = sqlite3.connect(get_db_path())
-        cursor = conn.cursor()
-
-        for email in emails:
-            cursor.execute("""
-                INSERT INTO emails (id, sender, sender_email, subject, body, received_at)
-                VALUES (?, ?, ?, ?, ?, ?)
-                ON CONFLICT(id) DO UPDATE SET
-                    sender = excluded.sender,
-                    sender_email = excluded.sender_email,
-                    subject = excluded.subject,
-                    body = excluded.body,
-                    received_at = excluded.received_at
-            """, (
-                email["id"],
-                email["sender"],
-                email["email"],
-                email["subject"],
-                email["body"],
-                email["received_at"]
-            ))
-            inserted += cursor.rowcount
-
-        conn.commit()
-        conn.close()
-
-        return JSONResponse({"fetched": len(emails), "inserted": inserted})
+        # Stream pages from GmailService straight into the database
+        gmail = get_gmail_service()
+        result = ingest_email_pages(gmail.iter_emails(
+            since=query_date, unread_only=True, exclude=None if refresh else get_existing_email_ids
+        ))
+        logging.info(f"📥 Fetched {result['fetched']} emails")
+
+        return JSONResponse({**result, "fetch_stats": gmail.last_fetch_stats})
     except Exception as e:
         logging.error(f"❌ Failed to fetch emails: {e}")
         return JSONResponse(status_code=500, content={"error": str(e)})
 
-@router.get("/debug/fetch14")
-def fetch_last_14_days():
+
+def fetch_past_days(days: int, on_conflict: str = "update", refresh: bool = False):
     """
-    Fetch all emails from the last 14 days (excluding today) and insert them into the database.
+    Stream all emails from the last `days` days (excluding today) into the database,
+    committing each page as it arrives. Only ids not yet stored are downloaded unless
+    `refresh` is set, in which case every listed message is re-pulled and updated.
     """
     try:
-        logging.info("📥 Debug: Fetching all emails from the last 14 days (excluding today)")
-        gmail = GmailService(token_path="/data/token.json")
+        logging.info(f"📥 Debug: Fetching all emails from the last {days} days (excluding today)")
+        gmail = get_gmail_service()
 
         end_date = datetime.utcnow().date()
-        start_date = end_date - timedelta(days=14)
+        start_date = end_date - timedelta(days=days)
         query_date = start_date.strftime("%Y-%m-%d")
 
-        emails = gmail.fetch_emails(since=query_date, unread_only=False)
-        logging.info(f"📬 Retrieved {len(emails)} total emails")
-
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        inserted = 0
-
-        for email in emails:
-            received_str = email.get("received_at")
-            if not received_str:
-                continue
-
-            received_date = datetime.fromisoformat(received_str).date()
-            if received_date >= end_date:
-                continue  # Skip emails from today
-
-            cursor.execute("""
-                INSERT INTO emails (id, sender, sender_email, subject, body, received_at)
-                VALUES (?, ?, ?, ?, ?, ?)
-                ON CONFLICT(id) DO UPDATE SET
-                    sender = excluded.sender,
-                    sender_email = excluded.sender_email,
-                    subject = excluded.subject,
-                    body = excluded.body,
-                    received_at = excluded.received_at
-            """, (
-                email.get("id"),
-                email.get("sender"),
-                email.get("email"),
-                email.get("subject"),
-                email.get("body", ""),
-                email.get("received_at"),
-            ))
-            inserted += cursor.rowcount
-
-        conn.commit()
-        conn.close()
-
-        return JSONResponse({"fetched": len(emails), "inserted": inserted})
+        result = ingest_email_pages(
+            gmail.iter_emails(
+                since=query_date, unread_only=False, exclude=None if refresh else get_existing_email_ids
+            ),
+            on_conflict="update" if refresh else on_conflict,
+            received_before=end_date
+        )
+        logging.info(f"📬 Retrieved {result['fetched']} total emails")
+
+        return JSONResponse({**result, "fetch_stats": gmail.last_fetch_stats})
     except Exception as e:
-        logging.error(f"❌ Fetch 14 days error: {e}")
+        logging.error(f"❌ Fetch {days} days error: {e}")
         return JSONResponse(status_code=500, content={"error": str(e)})
 
-@router.get("/debug/fetch90")
-def fetch_last_90_days():
+def start_backfill_days(days: int, on_conflict: str = "update", refresh: bool = False):
     """
-    Fetch all emails from the last 14 days (excluding today) and insert them into the database.
+    Create and start a backfill job for the last `days` days and return its id.
     """
     try:
-        logging.info("📥 Debug: Fetching all emails from the last 14 days (excluding today)")
-        gmail = GmailService(token_path="/data/token.json")
-
-        end_date = datetime.utcnow().date()
-        start_date = end_date - timedelta(days=90)
-        query_date = start_date.strftime("%Y-%m-%d")
-
-        emails = gmail.fetch_emails(since=query_date, unread_only=False)
-        logging.info(f"📬 Retrieved {len(emails)} total emails")
-
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        inserted = 0
-
-        for email in emails:
-            received_str = email.get("received_at")
-            if not received_str:
-                continue
-
-            received_date = datetime.fromisoformat(received_str).date()
-            if received_date >= end_date:
-                # Skip emails from today
-                continue
-
-            cursor.execute("""
-                INSERT INTO emails (id, sender, sender_email, subject, body, received_at)
-                VALUES (?, ?, ?, ?, ?, ?)
-                ON CONFLICT(id) DO UPDATE SET
-                    sender = excluded.sender,
-                    sender_email = excluded.sender_email,
-                    subject = excluded.subject,
-                    body = excluded.body,
-                    received_at = excluded.received_at
-            """, (
-                email.get("id"),
-                email.get("sender"),
-                email.get("email"),
-                email.get("subject"),
-                email.get("body", ""),
-                email.get("received_at"),
-            ))
-            inserted += cursor.rowcount
-
-        conn.commit()
-        conn.close()
-
-        return JSONResponse({"fetched": len(emails), "inserted": inserted})
+        job_id = create_backfill_job(
+            days, on_conflict="update" if refresh else on_conflict, refresh=refresh
+        )
+        start_backfill_job(job_id)
+        return JSONResponse({"status": "started", "job_id": job_id, "progress": f"/api/gmail/backfill/{job_id}"})
     except Exception as e:
-        logging.error(f"❌ Fetch 14 days error: {e}")
+        logging.error(f"❌ Failed to start {days}-day backfill: {e}")
         return JSONResponse(status_code=500, content={"error": str(e)})
 
+@router.get("/debug/fetch14")
+def fetch_last_14_days(refresh: bool = False):
+    """
+    Fetch all emails from the last 14 days (excluding today) and insert them into the database.
+    """
+    return fetch_past_days(14, refresh=refresh)
+
+@router.get("/debug/fetch90")
+def fetch_last_90_days(refresh: bool = False):
+    """
+    Start a resumable background backfill of the last 90 days (excluding today).
+    Progress is available from /backfill/{job_id}.
+    """
+    return start_backfill_days(90, refresh=refresh)
+
 
 @router.get("/debug/classify-all")
 def classify_all_in_batches():
@@ -200,20 +131,13 @@ def classify_all_in_batches():
 
     try:
         # Get initial count
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT COUNT(*) FROM emails
-            WHERE category IS NULL OR category = 'Uncategorized'
-        """)
-        initial_remaining = cursor.fetchone()[0]
-        conn.close()
+        initial_remaining = get_email_counters()["unclassified"]
 
         logging.info(f"🚀 Starting classification of {initial_remaining} unclassified emails...")
 
         while True:
             start_time = time.time()
-            result = classify_email_batch(db_path)
+            result = classify_email_batch()
             end_time = time.time()
 
             if not result:
@@ -224,15 +148,11 @@ def classify_all_in_batches():
             batch_count += 1
             total_classified += len(result)
 
-            # Estimate remaining
-            conn = sqlite3.connect(db_path)
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT COUNT(*) FROM emails
-                WHERE category IS NULL OR category = 'Uncategorized'
-            """)
-            remaining = cursor.fetchone()[0]
-            conn.close()
+            # Estimate remaining once this batch's queued results are committed
+            if not WRITE_QUEUE.flush(timeout=WRITE_FLUSH_TIMEOUT_SECONDS):
+                logging.error(f"❌ Classification stopped after {batch_count} batches: queued writes are not being committed")
+                return _write_backlog_response()
+            remaining = get_email_counters()["unclassified"]
 
             avg_time = total_time / batch_count
             est_remaining_time = avg_time * (remaining // 100 + (1 if remaining % 100 else 0))
@@ -269,14 +189,10 @@ def classify_one_batch():
         batch_size = len(result) if result else 0
 
         # Check how many unclassified emails remain
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT COUNT(*) FROM emails
-            WHERE category IS NULL OR category = 'Uncategorized'
-        """)
-        remaining = cursor.fetchone()[0]
-        conn.close()
+        if not WRITE_QUEUE.flush(timeout=WRITE_FLUSH_TIMEOUT_SECONDS):
+            logging.error("❌ Queued classification writes were not committed in time")
+            return _write_backlog_response()
+        remaining = get_email_counters()["unclassified"]
 
         logging.info(f"🧠 Classified {batch_size} emails in one batch — 📨 {remaining} remaining unclassified")
 
@@ -291,64 +207,12 @@ def classify_one_batch():
         return JSONResponse(status_code=500, content={"error": str(e)})
 
 @router.get("/debug/fetch-6m")
-def fetch_last_90_days():
+def fetch_last_6_months(refresh: bool = False):
     """
-    Fetch all emails from the last 14 days (excluding today) and insert them into the database.
+    Start a resumable background backfill of the last 6 months (excluding today)
+    that does not overwrite stored rows. Progress is available from /backfill/{job_id}.
     """
-    try:
-        logging.info("📥 Debug: Fetching all emails from the last 14 days (excluding today)")
-        gmail = GmailService(token_path="/data/token.json")
-
-        end_date = datetime.utcnow().date()
-        start_date = end_date - timedelta(days=182)
-        query_date = start_date.strftime("%Y-%m-%d")
-
-        emails = gmail.fetch_emails(since=query_date, unread_only=False)
-        logging.info(f"📬 Retrieved {len(emails)} total emails")
-
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        inserted = 0
-
-        for email in emails:
-            received_str = email.get("received_at")
-            if not received_str:
-                continue
-
-            received_date = datetime.fromisoformat(received_str).date()
-            if received_date >= end_date:
-                # Skip emails from today
-                continue
-
-            cursor.execute("""
-                INSERT OR IGNORE INTO emails (
-                    id, sender, sender_email, subject, body,
-                    received_at, category, predicted_by,
-                    confidence, manual_override, override_timestamp, model_version
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                email.get("id"),
-                email.get("sender"),
-                email.get("email"),
-                email.get("subject"),
-                email.get("body", ""),
-                email.get("received_at"),
-                email.get("category", "Uncategorized"),
-                email.get("predicted_by"),
-                email.get("confidence"),
-                email.get("manual_override", 0),
-                email.get("override_timestamp"),
-                email.get("model_version")
-            ))
-            inserted += cursor.rowcount
-
-        conn.commit()
-        conn.close()
-
-        return JSONResponse({"fetched": len(emails), "inserted": inserted})
-    except Exception as e:
-        logging.error(f"❌ Fetch 14 days error: {e}")
-        return JSONResponse(status_code=500, content={"error": str(e)})
+    return start_backfill_days(182, on_conflict="ignore", refresh=refresh)
 
 from fastapi import APIRouter, BackgroundTasks
 from fastapi.responses import JSONResponse
@@ -1,6 +1,5 @@
 
 # Standard library imports
-import sqlite3
 import logging
 from datetime import datetime, time
 import pytz  
@@ -10,45 +9,43 @@ from fastapi import APIRouter
 from fastapi.responses import JSONResponse
 
 # Application-specific imports
-from app.utils.database import get_db_path
+from app.utils.database import get_connection, get_email_counters
+from app.utils.listing import list_email_page
 
 
 # Initialize router
 router = APIRouter()
-db_path = get_db_path()
 
 @router.get("/list")
-def list_emails():
+def list_emails(cursor: str = None, limit: int = 100, category: str = None, sender: str = None,
+                predicted_by: str = None, min_confidence: float = None, max_confidence: float = None):
     """
-    Retrieve a list of stored emails from the database.
+    Retrieve a page of stored emails, newest first. Pass `next_cursor` from the
+    previous response as `cursor` to get the next page.
     """
     try:
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT id, sender, sender_email, subject, category, received_at, predicted_by, confidence
-            FROM emails
-            ORDER BY received_at DESC
-            LIMIT 100
-        """)
-        rows = cursor.fetchall()
-        conn.close()
+        page = list_email_page(
+            cursor=cursor, limit=limit, category=category, sender=sender, predicted_by=predicted_by,
+            min_confidence=min_confidence, max_confidence=max_confidence
+        )
 
         emails = [
             {
-                "id": row[0],
-                "sender": row[1],
-                "email": row[2],
-                "subject": row[3],
-                "category": row[4],
-                "received_at": row[5],
-                "predicted_by": row[6],
-                "confidence": row[7]
+                "id": email["id"],
+                "sender": email["sender"],
+                "email": email["sender_email"],
+                "subject": email["subject"],
+                "category": email["category"],
+                "received_at": email["received_at"],
+                "predicted_by": email["predicted_by"],
+                "confidence": email["confidence"]
             }
-            for row in rows
+            for email in page["emails"]
         ]
 
-        return JSONResponse({"emails": emails})
+        return JSONResponse({"emails": emails, "next_cursor": page["next_cursor"]})
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
     except Exception as e:
         logging.error(f"❌ Error listing emails: {e}")
         return JSONResponse(status_code=500, content={"error": str(e)})
@@ -59,11 +56,8 @@ def list_labels():
     Retrieve a list of available email labels from the database.
     """
     try:
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        cursor.execute("SELECT label FROM labels ORDER BY label")
-        rows = cursor.fetchall()
-        conn.close()
+        with get_connection() as conn:
+            rows = conn.execute("SELECT label FROM labels ORDER BY label").fetchall()
 
         return JSONResponse({"labels": [row[0] for row in rows]})
     except Exception as e:
@@ -80,14 +74,11 @@ def get_unread_today():
 
         print(f"🔍 Checking unread since: {midnight_str}")
 
-        conn = sqlite3.connect(get_db_path())
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT COUNT(*) FROM emails
-            WHERE category = 'Uncategorized' AND received_at >= ?
-        """, (midnight_str,))
-        count = cursor.fetchone()[0]
-        conn.close()
+        with get_connection() as conn:
+            count = conn.execute("""
+                SELECT COUNT(*) FROM emails
+                WHERE category = 'Uncategorized' AND received_at >= ?
+            """, (midnight_str,)).fetchone()[0]
 
         return JSONResponse({"unread_today": count})
 
@@ -101,11 +92,7 @@ def get_total_email_count():
     Returns the total number of stored emails.
     """
     try:
-        conn = sqlite3.connect(get_db_path())
-        cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM emails")
-        count = cursor.fetchone()[0]
-        conn.close()
+        count = get_email_counters()["total"]
 
         return JSONResponse({"total_emails": count})
     except Exception as e:
@@ -1,20 +1,17 @@
 # Standard library imports
-import sqlite3
 import logging
 import json
-import time
 
 # Third-party imports
 from fastapi import APIRouter
 from fastapi.responses import JSONResponse
 
 # Application-specific imports
-from app.utils.database import get_db_path, update_sender_reputation
+from app.utils.database import get_connection, get_label_rollup, rebuild_sender_label_counts
 from app.utils.trainer import train_local_classifier
 
 # Initialize router
 router = APIRouter()
-db_path = get_db_path()
 
 @router.get("/reputation")
 def list_sender_reputation():
@@ -22,16 +19,17 @@ def list_sender_reputation():
     List sender reputation stats.
     """
     try:
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT sender_email, sender_name, reputation_score, reputation_state, classification_counts, last_updated
-            FROM sender_reputation
-            ORDER BY reputation_score DESC
-            LIMIT 100
-        """)
-        rows = cursor.fetchall()
-        conn.close()
+        with get_connection() as conn:
+            rows = conn.execute("""
+                SELECT r.sender_email, r.sender_name, r.reputation_score, r.reputation_state,
+                       (SELECT json_group_object(c.label, c.count)
+                        FROM sender_label_counts c
+                        WHERE c.sender_email = r.sender_email AND c.count > 0),
+                       r.last_updated
+                FROM sender_reputation r
+                ORDER BY r.reputation_score DESC
+                LIMIT 100
+            """).fetchall()
 
         results = [
             {
@@ -39,7 +37,7 @@ def list_sender_reputation():
                 "name": row[1],
                 "score": row[2],
                 "state": row[3],
-                "counts": json.loads(row[4]),
+                "counts": json.loads(row[4] or "{}"),
                 "updated": row[5]
             }
             for row in rows
@@ -50,49 +48,26 @@ def list_sender_reputation():
         logging.error(f"❌ Reputation fetch failed: {e}")
         return JSONResponse(status_code=500, content={"error": str(e)})
 
+@router.get("/reputation/labels")
+def list_label_rollup():
+    """
+    Email and sender totals per label across all senders.
+    """
+    try:
+        return JSONResponse({"labels": get_label_rollup()})
+    except Exception as e:
+        logging.error(f"❌ Label rollup failed: {e}")
+        return JSONResponse(status_code=500, content={"error": str(e)})
+
 @router.post("/reputation/recalculate")
 def recalculate_all_sender_reputations():
     """
     Recalculate reputation data for all senders based on existing email classifications.
+    Label counts are rebuilt from one GROUP BY over emails, replacing the stored ones.
     """
     try:
         logging.info("🔄 Starting reputation recalculation...")
-
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-
-        logging.info("📥 Fetching sender/category data from emails table...")
-        cursor.execute("""
-            SELECT sender_email, sender, category
-            FROM emails
-            WHERE sender_email IS NOT NULL AND category IS NOT NULL
-        """)
-        rows = cursor.fetchall()
-        conn.close()
-        logging.info(f"📊 Retrieved {len(rows)} classified emails with sender info.")
-
-        from collections import defaultdict, Counter
-        sender_data = defaultdict(lambda: {"name": "", "counts": Counter()})
-
-        for email, name, category in rows:
-            sender_data[email]["name"] = name
-            sender_data[email]["counts"][category] += 1
-
-        logging.info(f"🔢 Found {len(sender_data)} unique senders to update.")
-
-        updated = 0
-        for email, data in sender_data.items():
-            logging.info(f"📨 Updating reputation for: {email} ({data['name']})")
-            for label, count in data["counts"].items():
-                logging.info(f"  🔁 Label '{label}' — {count} occurrence(s)")
-                for i in range(count):
-                    update_sender_reputation(email, data["name"], label)
-            updated += 1
-
-            # Throttle to avoid overloading the system
-            if updated % 100 == 0:  # Pause every 100 updates
-                logging.info("⏳ Throttling to reduce system load...")
-                time.sleep(1)
+        updated = rebuild_sender_label_counts()
 
         logging.info(f"✅ Sender reputation updated for {updated} senders.")
         return JSONResponse({
@@ -111,46 +86,27 @@ def recalculate_sender_reputation(sender_email: str):
     """
     try:
         logging.info(f"🔄 Starting reputation recalculation for sender: {sender_email}")
+        rebuild_sender_label_counts(sender_email)
 
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-
-        logging.info(f"📥 Fetching email classifications for sender: {sender_email}")
-        cursor.execute("""
-            SELECT sender_email, sender, category
-            FROM emails
-            WHERE sender_email = ? AND category IS NOT NULL
-        """, (sender_email,))
-        rows = cursor.fetchall()
-        conn.close()
+        with get_connection() as conn:
+            counts = dict(conn.execute("""
+                SELECT label, count FROM sender_label_counts
+                WHERE sender_email = ? AND count > 0
+            """, (sender_email,)).fetchall())
 
-        if not rows:
+        if not counts:
             logging.info(f"⚠️ No classified emails found for sender: {sender_email}")
             return JSONResponse({
                 "status": "no_data",
                 "message": f"No classified emails found for sender: {sender_email}"
             }, status_code=404)
 
-        from collections import Counter
-        sender_data = {"name": rows[0][1], "counts": Counter()}
-
-        for _, _, category in rows:
-            sender_data["counts"][category] += 1
-
-        logging.info(f"🔢 Found {len(rows)} classified emails for sender: {sender_email}")
-        logging.info(f"📊 Category counts: {dict(sender_data['counts'])}")
-
-        # Update the sender's reputation
-        for label, count in sender_data["counts"].items():
-            logging.info(f"  🔁 Updating reputation for label '{label}' — {count} occurrence(s)")
-            for i in range(count):
-                update_sender_reputation(sender_email, sender_data["name"], label)
-
+        logging.info(f"📊 Category counts: {counts}")
         logging.info(f"✅ Reputation recalculated for sender: {sender_email}")
         return JSONResponse({
             "status": "recalculated",
             "sender": sender_email,
-            "categories": dict(sender_data["counts"])
+            "categories": counts
         })
 
     except Exception as e:
@@ -158,12 +114,13 @@ def recalculate_sender_reputation(sender_email: str):
         return JSONResponse(status_code=500, content={"error": str(e)})
 
 @router.post("/reputation/train")
-def train_local_classifier_endpoint():
+def train_local_classifier_endpoint(include_local: bool = False):
     """
-    Train the local classifier using the current sender reputation data.
+    Train the local classifier on OpenAI and manual labels, weighted by source.
+    `include_local` also trains on the local model's own predictions (never evaluated on).
     """
     try:
-        result = train_local_classifier(source="openai")
+        result = train_local_classifier(include_local=include_local)
         if result:
             return JSONResponse({"status": "trained"})
         else:
@@ -0,0 +1,39 @@
+# Standard library imports
+import logging
+import time
+
+# Third-party imports
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+# Application-specific imports
+from app.utils.search import MAX_PAGE_SIZE, search_emails
+
+# Initialize router
+router = APIRouter()
+
+@router.get("/search")
+def search(q: str, page: int = 1, page_size: int = 20):
+    """
+    Ranked full-text search over stored emails (subject, body, sender, address).
+    Pages are 1-based; `has_more` tells whether another page exists.
+    """
+    try:
+        # Clamp before computing the offset so page N starts where page N-1 ended
+        page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+        started = time.perf_counter()
+        result = search_emails(q, limit=page_size, offset=(max(page, 1) - 1) * page_size)
+        took_ms = round((time.perf_counter() - started) * 1000, 2)
+        logging.debug(f"🔎 Search '{q}' page {page}: {len(result['results'])} results in {took_ms} ms")
+
+        return JSONResponse({
+            "q": q,
+            "page": max(page, 1),
+            "page_size": result["limit"],
+            "has_more": result["has_more"],
+            "took_ms": took_ms,
+            "results": result["results"]
+        })
+    except Exception as e:
+        logging.error(f"❌ Search failed for '{q}': {e}")
+        return JSONResponse(status_code=500, content={"error": str(e)})
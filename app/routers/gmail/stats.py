@@ -1,5 +1,4 @@
 # Standard library imports
-import sqlite3
 import logging
 import json
 # Third-party imports
@@ -7,11 +6,11 @@ from fastapi import APIRouter
 from fastapi.responses import JSONResponse
 
 # Application-specific imports
-from app.utils.database import get_db_path, get_system_value
+from app.utils.database import get_email_counters, get_system_value
+from app.utils.mailbox_counters import get_unread_count
 
 # Initialize router
 router = APIRouter()
-db_path = get_db_path()
 
 @router.get("/stats")
 def get_email_stats():
@@ -20,60 +19,39 @@ def get_email_stats():
     last pre-classification time, and last training time.
     """
     try:
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
+        # Total and unclassified emails from the trigger-maintained counters
+        counters = get_email_counters()
+        total = counters["total"]
+        unclassified = counters["unclassified"]
 
-        # Total emails
-        cursor.execute("SELECT COUNT(*) FROM emails")
-        total = cursor.fetchone()[0]
-
-        # Unclassified
-        cursor.execute("""
-            SELECT COUNT(*) FROM emails
-            WHERE category IS NULL OR category = 'Uncategorized'
-        """)
-        unclassified = cursor.fetchone()[0]
-
-        # Last pre-classify time (based on system table value)
-        cursor.execute("""
-            SELECT value
-            FROM system
-            WHERE key = 'local_model_last_prediction'
-        """)
-        row = cursor.fetchone()
+        # Last pre-classify time (based on system table value, served from the cache)
         last_preclassify = None
-        if row:
-            try:
-                value = json.loads(row[0])  # Ensure it's valid JSON
-                if isinstance(value, dict):  # Ensure it's a dictionary
-                    last_preclassify = value.get("timestamp")
-            except json.JSONDecodeError:
-                logging.error("❌ Failed to parse 'local_model_last_prediction' as JSON.")
+        try:
+            value = get_system_value("local_model_last_prediction")
+            if isinstance(value, dict):  # Ensure it's a dictionary
+                last_preclassify = value.get("timestamp")
+        except json.JSONDecodeError:
+            logging.error("❌ Failed to parse 'local_model_last_prediction' as JSON.")
 
         # Last trained model timestamp from system table
-        cursor.execute("""
-            SELECT value
-            FROM system
-            WHERE key = 'local_model_evaluation'
-        """)
-        row = cursor.fetchone()
         last_trained = None
-        if row:
-            try:
-                value = json.loads(row[0])  # Ensure it's valid JSON
-                if isinstance(value, dict):  # Ensure it's a dictionary
-                    last_trained = value.get("timestamp")
-            except json.JSONDecodeError:
-                logging.error("❌ Failed to parse 'local_model_evaluation' as JSON.")
+        try:
+            value = get_system_value("local_model_evaluation")
+            if isinstance(value, dict):  # Ensure it's a dictionary
+                last_trained = value.get("timestamp")
+        except json.JSONDecodeError:
+            logging.error("❌ Failed to parse 'local_model_evaluation' as JSON.")
 
-        conn.close()
-        
         logging.debug(f"📊 Email stats: total={total}, unclassified={unclassified}, last_preclassify={last_preclassify}, last_trained={last_trained}")
-        count = get_system_value("unread_email_count")  # Update unread email count if needed
+        unread = get_unread_count()  # Cached Gmail label counters, kept current by sync deltas
         return JSONResponse({
             "total": total,
             "unclassified": unclassified,
-            "unread": count,  
+            "by_category": counters["by_category"],
+            "by_predicted_by": counters["by_predicted_by"],
+            "unread": unread["unread"],
+            "unread_updated_at": unread["updated_at"],
+            "unread_age_seconds": unread["age_seconds"],
             "last_preclassify": last_preclassify,
             "last_trained": last_trained,
             "model": get_system_value("local_model")
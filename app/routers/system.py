@@ -1,6 +1,4 @@
 # Standard library imports
-import sqlite3
-import json
 import logging
 
 # Third-party imports
@@ -8,11 +6,14 @@ from fastapi import APIRouter
 from fastapi.responses import JSONResponse
 
 # Application-specific imports
-from app.utils.database import get_db_path
+from app.utils.database import get_connection, get_system_value
+from app.utils.migrations import get_schema_version, explain_hot_queries
+from app.utils.model_cache import get_model_cache_stats
+from app.utils.prediction_telemetry import get_prediction_telemetry
+from app.utils.model_registry import list_models, promote_model, rollback_model, get_current_pointer
 
 # Initialize router
 router = APIRouter()
-db_path = get_db_path()
 
 @router.get("/api/hello")
 def hello():
@@ -25,15 +26,13 @@ def hello():
 @router.post("/api/clear_all_tables")
 def clear_all_tables():
     """
-    Clears all data from the 'emails' and 'sender_reputation' tables.
+    Clears all data from the 'emails', 'sender_reputation' and 'sender_label_counts' tables.
     """
     try:
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM emails")
-        cursor.execute("DELETE FROM sender_reputation")
-        conn.commit()
-        conn.close()
+        with get_connection() as conn:
+            conn.execute("DELETE FROM emails")
+            conn.execute("DELETE FROM sender_reputation")
+            conn.execute("DELETE FROM sender_label_counts")
         return JSONResponse({"status": "success", "message": "All tables cleared."})
     except Exception as e:
         logging.error(f"❌ Error clearing tables: {e}")
@@ -45,18 +44,95 @@ def get_model_metrics():
     Retrieves the evaluation metrics of the local machine learning model.
     """
     try:
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        cursor.execute("SELECT value FROM system WHERE key = ?", ("local_model_evaluation",))
-        row = cursor.fetchone()
-        conn.close()
-
-        if not row:
+        metrics = get_system_value("local_model_evaluation")
+        if not metrics:
             return JSONResponse(status_code=404, content={"error": "No evaluation data found."})
 
-        metrics = json.loads(row[0])
         return JSONResponse(content=metrics)
 
     except Exception as e:
         logging.error(f"❌ Error retrieving model metrics: {e}")
         return JSONResponse(status_code=500, content={"error": str(e)})
+
+@router.get("/model/cache")
+def get_model_cache():
+    """
+    Reports how often predictions were served by the in-memory model and how long loads took.
+    """
+    try:
+        return JSONResponse(get_model_cache_stats())
+    except Exception as e:
+        logging.error(f"❌ Error retrieving model cache stats: {e}")
+        return JSONResponse(status_code=500, content={"error": str(e)})
+
+@router.get("/model/telemetry")
+def get_model_telemetry():
+    """
+    Returns local-model prediction counts, label distribution and confidence histogram.
+    """
+    try:
+        return JSONResponse(get_prediction_telemetry())
+    except Exception as e:
+        logging.error(f"❌ Error retrieving prediction telemetry: {e}")
+        return JSONResponse(status_code=500, content={"error": str(e)})
+
+@router.get("/model/versions")
+def get_model_versions():
+    """
+    Lists registered model versions with training metrics, live latency and how
+    often users corrected each version's labels.
+    """
+    try:
+        latency = get_prediction_telemetry().get("by_version", {})
+        models = list_models()
+        for model in models:
+            model["latency"] = latency.get(model["version"])
+        return JSONResponse({"current": get_current_pointer(), "models": models})
+    except Exception as e:
+        logging.error(f"❌ Error listing model versions: {e}")
+        return JSONResponse(status_code=500, content={"error": str(e)})
+
+@router.post("/model/promote")
+def promote_model_version(version: str):
+    """
+    Makes a registered model version live.
+    """
+    try:
+        pointer = promote_model(version)
+        return JSONResponse({"status": "success", "message": f"Model {version} promoted.", **pointer})
+    except FileNotFoundError as e:
+        return JSONResponse(status_code=404, content={"error": str(e)})
+    except Exception as e:
+        logging.error(f"❌ Error promoting model {version}: {e}")
+        return JSONResponse(status_code=500, content={"error": str(e)})
+
+@router.post("/model/rollback")
+def rollback_model_version(version: str = None):
+    """
+    Switches back to the previous live model, or to an earlier `version`.
+    """
+    try:
+        pointer = rollback_model(version)
+        return JSONResponse({"status": "success", "message": f"Rolled back to model {pointer['version']}.", **pointer})
+    except (ValueError, FileNotFoundError) as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    except Exception as e:
+        logging.error(f"❌ Error rolling back model: {e}")
+        return JSONResponse(status_code=500, content={"error": str(e)})
+
+@router.get("/api/db/query-plans")
+def get_query_plans():
+    """
+    Reports the schema version and whether each hot query is served by an index.
+    """
+    try:
+        conn = get_connection()
+        plans = explain_hot_queries(conn)
+        return JSONResponse({
+            "schema_version": get_schema_version(conn),
+            "all_indexed": all(plan["uses_index"] for plan in plans),
+            "queries": plans
+        })
+    except Exception as e:
+        logging.error(f"❌ Error explaining query plans: {e}")
+        return JSONResponse(status_code=500, content={"error": str(e)})
@@ -1,4 +1,3 @@
-import sqlite3
 import logging
 import json
 import time
@@ -13,29 +12,34 @@ logging.basicConfig(
 )
 
 from collections import Counter
-from datetime import datetime, timedelta
-from app.utils.database import get_db_path, update_sender_reputation, save_system_value
-from app.utils.classifier import check_sender_spamhaus, predict_with_local_model, classify_email_batch
-from app.gmail_service import GmailService
+from datetime import datetime, timedelta, timezone
+from app.utils.database import get_connection, save_system_value, get_system_value, get_existing_email_ids
+from app.utils.write_queue import queue_classifications, queue_reputation_update
+from app.utils.classifier import check_sender_spamhaus, predict_many, classify_email_batch
+from app.utils.ingest import ingest_email_pages
+from app.utils.mailbox_counters import apply_label_deltas, invalidate_mailbox_counters
+from app.gmail_service import GmailService, HistoryExpiredError, get_gmail_service
 
 
 CONFIDENCE_THRESHOLD = 80  # Customize this if you like
 
+# Incremental sync checkpoints stored in the system table
+HISTORY_ID_KEY = "gmail_history_id"
+LAST_SYNC_KEY = "gmail_last_sync"
+# Message ids a sync failed to fetch, retried on the following syncs
+SYNC_RETRY_KEY = "gmail_sync_retry_ids"
+SYNC_RETRY_LIMIT = 5
+
 async def run_full_classification_pipeline():
     logging.info("🚀 Starting full classification pipeline...")
 
-    db_path = get_db_path()
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-
     # Step 1: Fetch unclassified emails
-    cursor.execute("""
-        SELECT id, sender, sender_email, subject
-        FROM emails
-        WHERE category IS NULL OR category = 'Uncategorized'
-    """)
-    emails = cursor.fetchall()
-    conn.close()
+    with get_connection() as conn:
+        emails = conn.execute("""
+            SELECT id, sender, sender_email, subject
+            FROM emails
+            WHERE category IS NULL OR category = 'Uncategorized'
+        """).fetchall()
 
     if not emails:
         logging.info("✅ No unclassified emails found.")
@@ -44,21 +48,30 @@ async def run_full_classification_pipeline():
     logging.info(f"📬 Found {len(emails)} unclassified emails.")
 
     remaining_for_openai = []
+    classified = []  # (email_id, category, predicted_by, confidence[, model_version]), handed to the writer thread
 
+    candidates = []
     for email_id, sender, sender_email, subject in emails:
         # Step 2: Spamhaus check
         if check_sender_spamhaus(sender_email):
             logging.info(f"⚠️ {sender_email} listed in Spamhaus. Marking as Suspected Spam.")
-            mark_classification(email_id, "Suspected Spam", "spamhaus")
-            update_sender_reputation(sender_email, sender, "Suspected Spam")
+            classified.append((email_id, "Suspected Spam", "spamhaus", None))
+            queue_reputation_update(sender_email, sender, "Suspected Spam")
             continue
-
-        # Step 3: Try local classifier
-        prediction, confidence = predict_with_local_model(sender, sender_email, subject)
-        if prediction and confidence >= CONFIDENCE_THRESHOLD:
-            logging.info(f"✅ {email_id} classified as {prediction} ({confidence}%) by local model.")
-            mark_classification(email_id, prediction, "local", confidence)
-            update_sender_reputation(sender_email, sender, prediction)
+        candidates.append((email_id, sender, sender_email, subject))
+
+    # Step 3: Try local classifier on all remaining emails in one vectorized call
+    started = time.perf_counter()
+    predictions, confidences, model_version = predict_many([(sender, sender_email, subject) for _, sender, sender_email, subject in candidates])
+    if predictions is not None:
+        logging.info(f"🧠 Local model {model_version} scored {len(candidates)} emails in {time.perf_counter() - started:.3f}s")
+
+    for index, (email_id, sender, sender_email, subject) in enumerate(candidates):
+        if predictions is not None and confidences[index] >= CONFIDENCE_THRESHOLD:
+            prediction, confidence = str(predictions[index]), int(confidences[index])
+            logging.debug(f"✅ {email_id} classified as {prediction} ({confidence}%) by local model.")
+            classified.append((email_id, prediction, "local", confidence, model_version))
+            queue_reputation_update(sender_email, sender, prediction)
         else:
             remaining_for_openai.append({
                 "id": email_id,
@@ -67,6 +80,8 @@ async def run_full_classification_pipeline():
                 "subject": subject
             })
 
+    queue_classifications(classified)
+
     logging.info(f"🤖 {len(remaining_for_openai)} emails queued for OpenAI classification...")
 
     # Step 4: Classify remaining with OpenAI in batches of 40
@@ -89,90 +104,141 @@ async def run_full_classification_pipeline():
     }
 
 
-def mark_classification(email_id, category, predicted_by, confidence):
+def _load_sync_retries() -> dict:
     """
-    Marks an email with a classification category, prediction source, and confidence.
+    Returns {message_id: failed_attempts} for messages a previous sync could not fetch.
     """
-    conn = sqlite3.connect(get_db_path())
-    cursor = conn.cursor()
-    cursor.execute("""
-        UPDATE emails
-        SET category = ?, predicted_by = ?, confidence = ?, override_timestamp = NULL
-        WHERE id = ?
-    """, (category, predicted_by, confidence, email_id))
-    conn.commit()
-    conn.close()
+    return get_system_value(SYNC_RETRY_KEY) or {}
 
 
-def fetch_last_hour_emails(background_tasks: BackgroundTasks = None):
+def _save_sync_retries(previous: dict, attempted, failed):
     """
-    Fetches emails from the last hour and triggers classification pipeline asynchronously.
+    Records which of the attempted ids still failed, dropping ids that succeeded
+    and giving up (loudly) on ids that failed SYNC_RETRY_LIMIT times.
     """
-    try:
-        if background_tasks is None:
-            background_tasks = BackgroundTasks()  # Create a new instance if not provided
+    failed = set(failed)
+    retries = {msg_id: count for msg_id, count in previous.items() if msg_id not in attempted}
+    for msg_id in failed:
+        attempts = previous.get(msg_id, 0) + 1
+        if attempts >= SYNC_RETRY_LIMIT:
+            logging.error(f"❌ Giving up on message {msg_id} after {attempts} failed sync attempts")
+            continue
+        retries[msg_id] = attempts
+    if failed:
+        logging.warning(f"⚠️ {len(failed)} messages could not be fetched; they will be retried on the next sync")
+    save_system_value(SYNC_RETRY_KEY, retries)
 
-        logging.info("⏰ Fetching emails from the last hour...")
-        gmail = GmailService(token_path="/data/token.json")
 
-        one_hour_ago = datetime.utcnow() - timedelta(hours=1)
-        query_date = one_hour_ago.strftime("%Y-%m-%d")  # Correctly format the datetime
+def sync_mailbox(gmail: GmailService = None, refresh: bool = False) -> dict:
+    """
+    Pulls new and changed mail into the database using the stored Gmail historyId
+    checkpoint. Falls back to a windowed resync since the last successful sync when
+    no checkpoint exists or Gmail's history has expired.
+    Messages already stored are never downloaded again unless `refresh` is set.
+    Messages that could not be fetched are remembered and retried on the next sync,
+    so advancing the checkpoint never loses them.
+
+    Returns:
+        dict: {"mode", "fetched", "inserted", "failed", "history_id"}
+    """
+    if gmail is None:
+        gmail = get_gmail_service()
+
+    now = datetime.utcnow()
+    start_history_id = get_system_value(HISTORY_ID_KEY)
+    retries = _load_sync_retries()
+    if retries and not refresh:
+        known = get_existing_email_ids(list(retries))
+        retries = {msg_id: count for msg_id, count in retries.items() if msg_id not in known}
+    wanted = None
+    mode = "incremental"
+
+    if start_history_id:
+        try:
+            delta = gmail.list_history(start_history_id)
+            new_history_id = delta["history_id"]
+            label_deltas = delta["label_deltas"]
+            # Changed messages matter too: a label change can bring a message into view
+            wanted = list(dict.fromkeys(delta["added"] + delta["changed"]))
+            if wanted and not refresh:
+                known = get_existing_email_ids(wanted)
+                wanted = [msg_id for msg_id in wanted if msg_id not in known]
+        except HistoryExpiredError as e:
+            logging.warning(f"⚠️ {e}. Falling back to windowed resync.")
+
+    if wanted is not None:
+        # Previously failed ids ride along with this window's messages
+        to_fetch = list(dict.fromkeys(wanted + list(retries)))
+        emails, failed = gmail.fetch_messages(to_fetch) if to_fetch else ([], [])
+        result = ingest_email_pages([emails], on_conflict="update" if refresh else "ignore")
+    else:
+        mode = "resync"
+        # Capture the checkpoint before listing so nothing arriving mid-resync is missed
+        new_history_id = gmail.get_history_id()
+        last_sync = get_system_value(LAST_SYNC_KEY)
+        if last_sync:
+            # No cap: everything since the last good sync must be covered or it is never synced
+            window_start = datetime.fromisoformat(last_sync) - timedelta(hours=1)
+        else:
+            window_start = now - timedelta(hours=1)
+        logging.info(f"🔁 Resyncing mailbox since {window_start.isoformat()}")
+        result = ingest_email_pages(gmail.iter_emails(
+            after_timestamp=window_start.replace(tzinfo=timezone.utc).timestamp(),
+            unread_only=False,
+            exclude=None if refresh else get_existing_email_ids
+        ), on_conflict="update" if refresh else "ignore")
+        listing_failed = list(gmail.last_fetch_stats.get("failed_ids", []))
+        to_fetch, failed = list(retries), []
+        if to_fetch:
+            emails, failed = gmail.fetch_messages(to_fetch)
+            retried = ingest_email_pages([emails], on_conflict="update" if refresh else "ignore")
+            result["fetched"] += retried["fetched"]
+            result["inserted"] += retried["inserted"]
+        failed = listing_failed + failed
+
+    # Only advance the checkpoint once the rows (or the ids still to retry) are safely stored
+    _save_sync_retries(retries, to_fetch, failed)
+    save_system_value(HISTORY_ID_KEY, new_history_id)
+    save_system_value(LAST_SYNC_KEY, now.isoformat())
+
+    # Keep cached mailbox counters current; a resync has no deltas, so force a refresh
+    if mode == "incremental":
+        apply_label_deltas(label_deltas)
+    else:
+        invalidate_mailbox_counters()
 
-        emails = gmail.fetch_emails(since=query_date, unread_only=False)
+    logging.info(
+        f"📥 Mailbox sync ({mode}): fetched {result['fetched']}, "
+        f"inserted {result['inserted']}, failed {len(failed)}, historyId {new_history_id}"
+    )
+    return {
+        "mode": mode,
+        "fetched": result["fetched"],
+        "inserted": result["inserted"],
+        "failed": len(failed),
+        "history_id": new_history_id
+    }
 
-        inserted = 0
-        conn = sqlite3.connect(get_db_path())
-        cursor = conn.cursor()
 
-        for email in emails:
-            received_at = email.get("received_at")
-            if not received_at:
-                continue
-
-            # Parse the date using ISO 8601 format
-            try:
-                received_at_dt = datetime.fromisoformat(received_at)
-            except ValueError as e:
-                logging.error(f"❌ Error parsing date '{received_at}': {e}")
-                continue
-
-            if received_at_dt < one_hour_ago:
-                continue
-
-            cursor.execute("""
-                INSERT OR IGNORE INTO emails (
-                    id, sender, sender_email, subject, body,
-                    received_at, category, predicted_by,
-                    confidence, manual_override, override_timestamp, model_version
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                email.get("id"),
-                email.get("sender"),
-                email.get("email"),
-                email.get("subject"),
-                email.get("body", ""),
-                received_at,
-                email.get("category", "Uncategorized"),
-                email.get("predicted_by"),
-                email.get("confidence"),
-                email.get("manual_override", 0),
-                email.get("override_timestamp"),
-                email.get("model_version")
-            ))
-            inserted += cursor.rowcount
-
-        conn.commit()
-        conn.close()
-
-        logging.info(f"📥 Inserted {inserted} emails from last hour")
+def fetch_last_hour_emails(background_tasks: BackgroundTasks = None):
+    """
+    Syncs new emails since the last checkpoint and triggers classification pipeline asynchronously.
+    """
+    try:
+        if background_tasks is None:
+            background_tasks = BackgroundTasks()  # Create a new instance if not provided
+
+        logging.info("⏰ Syncing new emails...")
+        gmail = get_gmail_service()
+        result = sync_mailbox(gmail)
 
         # Run classification pipeline in background
         import asyncio
         asyncio.create_task(run_full_classification_pipeline())  # Properly schedule the coroutine
 
         return JSONResponse({
-            "fetched": len(emails),
-            "inserted": inserted,
+            **result,
+            "fetch_stats": gmail.last_fetch_stats,
             "status": "Classification pipeline started in background"
         })
 
@@ -187,18 +253,13 @@ async def midnight_task():
     """
     try:
         logging.info("🌙 Running midnight task...")
-        db_path = get_db_path()
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-
         # Cleanup emails older than 1 year
         one_year_ago = datetime.utcnow() - timedelta(days=365)
-        cursor.execute("""
-            DELETE FROM emails WHERE received_at < ?
-        """, (one_year_ago.isoformat(),))
-        deleted_count = cursor.rowcount
-        conn.commit()
-        conn.close()
+        with get_connection() as conn:
+            cursor = conn.execute("""
+                DELETE FROM emails WHERE received_at < ?
+            """, (one_year_ago.isoformat(),))
+            deleted_count = cursor.rowcount
 
         logging.info(f"🗑️ Deleted {deleted_count} emails older than 1 year.")
 
@@ -220,8 +281,7 @@ async def check_and_retrain_model():
     """
     try:
         logging.info("🔍 Checking for manually classified emails or if today is Friday...")
-        db_path = get_db_path()
-        conn = sqlite3.connect(db_path)
+        conn = get_connection()
         cursor = conn.cursor()
 
         # Check if today is Friday
@@ -251,8 +311,6 @@ async def check_and_retrain_model():
             retrain_with_full_dataset(cursor)
         else:
             logging.info("✅ No retraining needed today.")
-
-        conn.close()
     except Exception as e:
         logging.error(f"❌ Error checking or retraining the model: {e}")
 
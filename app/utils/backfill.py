@@ -0,0 +1,292 @@
+# Standard library imports
+import json
+import sqlite3
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+# Application-specific imports
+from app.gmail_service import get_gmail_service
+from app.utils.database import get_connection, get_existing_email_ids
+from app.utils.ingest import ingest_email_pages
+
+# Windows of one job processed at the same time; Gmail calls are still paced
+# by the shared quota token bucket, so this only bounds parallel listings.
+BACKFILL_PARALLEL_WINDOWS = 3
+DEFAULT_WINDOW_DAYS = 7
+
+# Jobs with a runner thread in this process; no new runners start while paused
+_active_jobs = set()
+_active_jobs_lock = threading.Lock()
+_paused = False
+
+
+def create_backfill_job(days: int, window_days: int = DEFAULT_WINDOW_DAYS,
+                        on_conflict: str = "update", refresh: bool = False) -> int:
+    """
+    Creates a backfill job covering the last `days` days (excluding today) split into
+    windows of `window_days`, newest window first. Returns the job id.
+    Raises ValueError if `days` or `window_days` is below 1.
+    """
+    if days < 1 or window_days < 1:
+        raise ValueError(f"days and window_days must be at least 1 (got days={days}, window_days={window_days})")
+
+    end_date = datetime.utcnow().date()
+    start_date = end_date - timedelta(days=days)
+    now = datetime.utcnow().isoformat()
+
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT INTO backfill_jobs (start_date, end_date, window_days, on_conflict, refresh, status, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, 'pending', ?, ?)
+        """, (start_date.isoformat(), end_date.isoformat(), window_days, on_conflict, int(refresh), now, now))
+        job_id = cursor.lastrowid
+
+        window_end = end_date
+        while window_end > start_date:
+            window_start = max(start_date, window_end - timedelta(days=window_days))
+            cursor.execute("""
+                INSERT INTO backfill_windows (job_id, window_start, window_end, status)
+                VALUES (?, ?, ?, 'pending')
+            """, (job_id, window_start.isoformat(), window_end.isoformat()))
+            window_end = window_start
+
+    logging.info(f"🗂️ Created backfill job {job_id}: {start_date} → {end_date} in {window_days}-day windows")
+    return job_id
+
+
+def start_backfill_job(job_id: int) -> bool:
+    """
+    Runs (or resumes) a backfill job on a background thread. Failed and interrupted
+    windows are retried from their last saved page token. Returns False if the job
+    is already running in this process. Raises RuntimeError while backfills are paused.
+    """
+    with _active_jobs_lock:
+        if _paused:
+            raise RuntimeError("Backfills are paused while the database is restored; resume the job afterwards")
+        if job_id in _active_jobs:
+            return False
+        _active_jobs.add(job_id)
+
+    with get_connection() as conn:
+        conn.execute("""
+            UPDATE backfill_windows SET status = 'pending', error = NULL
+            WHERE job_id = ? AND status IN ('running', 'failed')
+        """, (job_id,))
+        conn.execute(
+            "UPDATE backfill_jobs SET status = 'running', updated_at = ? WHERE id = ?",
+            (datetime.utcnow().isoformat(), job_id)
+        )
+
+    threading.Thread(target=_run_job, args=(job_id,), name=f"backfill-{job_id}", daemon=True).start()
+    return True
+
+
+def resume_backfill_jobs():
+    """
+    Restarts every job that was pending or running when the process last stopped.
+    """
+    with get_connection() as conn:
+        rows = conn.execute("SELECT id FROM backfill_jobs WHERE status IN ('pending', 'running')").fetchall()
+    job_ids = [row[0] for row in rows]
+
+    for job_id in job_ids:
+        logging.info(f"▶️ Resuming backfill job {job_id}")
+        start_backfill_job(job_id)
+    return job_ids
+
+
+def pause_backfills() -> bool:
+    """
+    Stops new backfill runners from starting. Returns False (and does not pause)
+    if a job is running in this process.
+    """
+    global _paused
+    with _active_jobs_lock:
+        if _active_jobs:
+            return False
+        _paused = True
+    return True
+
+
+def resume_backfills():
+    """
+    Lets backfill jobs start again after pause_backfills().
+    """
+    global _paused
+    with _active_jobs_lock:
+        _paused = False
+
+
+def _run_job(job_id: int):
+    """
+    Processes the pending windows of a job in parallel and records the final status.
+    """
+    try:
+        job = get_backfill_job(job_id)
+        windows = [window for window in job["windows"] if window["status"] == "pending"]
+        logging.info(f"🚚 Backfill job {job_id}: {len(windows)} windows to process")
+
+        with ThreadPoolExecutor(max_workers=BACKFILL_PARALLEL_WINDOWS,
+                                thread_name_prefix=f"backfill-{job_id}") as pool:
+            list(pool.map(lambda window: _run_window(job, window), windows))
+
+        job = get_backfill_job(job_id)
+        status = "failed" if job["windows_failed"] else "done"
+        _set_job_status(job_id, status)
+        logging.info(
+            f"✅ Backfill job {job_id} {status}: {job['fetched']} fetched, {job['inserted']} inserted, "
+            f"{job['windows_failed']} failed windows"
+        )
+    except Exception as e:
+        logging.error(f"❌ Backfill job {job_id} crashed: {e}")
+        _set_job_status(job_id, "failed")
+    finally:
+        with _active_jobs_lock:
+            _active_jobs.discard(job_id)
+
+
+def _run_window(job: dict, window: dict):
+    """
+    Streams one date window into the database, saving the next page token after every
+    committed page so an interrupted window resumes where it stopped. Messages that
+    still fail after the client's retries are saved with the page token and fetched
+    again once listing is done; the window only counts as done when none are left.
+    """
+    window_id = window["id"]
+    start_ts = _utc_epoch(window["window_start"])
+    end_ts = _utc_epoch(window["window_end"])
+    failed_ids = json.loads(window.get("failed_ids") or "[]")
+    # A window that already listed its last page only has failed messages left to fetch
+    listing_done = window["pages"] > 0 and window["page_token"] is None
+
+    conn = get_connection()
+    with conn:
+        conn.execute("""
+            UPDATE backfill_windows SET status = 'running', started_at = COALESCE(started_at, ?)
+            WHERE id = ?
+        """, (datetime.utcnow().isoformat(), window_id))
+
+    try:
+        gmail = get_gmail_service()
+        if not listing_done:
+            pages = gmail.iter_emails(
+                query=f"after:{start_ts} before:{end_ts}",
+                page_token=window["page_token"],
+                exclude=None if job["refresh"] else get_existing_email_ids
+            )
+            seen_failures = 0
+            for emails, next_page_token in pages:
+                run_failed = gmail.last_fetch_stats.get("failed_ids", [])
+                failed_ids.extend(run_failed[seen_failures:])
+                seen_failures = len(run_failed)
+                result = ingest_email_pages([emails], on_conflict=job["on_conflict"])
+                with conn:
+                    conn.execute("""
+                        UPDATE backfill_windows
+                        SET page_token = ?, pages = pages + 1, fetched = fetched + ?, inserted = inserted + ?,
+                            failed_ids = ?
+                        WHERE id = ?
+                    """, (next_page_token, result["fetched"], result["inserted"], json.dumps(failed_ids), window_id))
+
+        if failed_ids:
+            logging.info(f"🔁 Backfill window {window['window_start']} → {window['window_end']}: retrying {len(failed_ids)} failed messages")
+            emails, failed_ids = gmail.fetch_messages(failed_ids)
+            result = ingest_email_pages([emails], on_conflict=job["on_conflict"])
+            with conn:
+                conn.execute("""
+                    UPDATE backfill_windows
+                    SET fetched = fetched + ?, inserted = inserted + ?, failed_ids = ?
+                    WHERE id = ?
+                """, (result["fetched"], result["inserted"], json.dumps(failed_ids), window_id))
+
+        if failed_ids:
+            raise Exception(f"{len(failed_ids)} messages could not be fetched; resume the job to retry them")
+
+        with conn:
+            conn.execute(
+                "UPDATE backfill_windows SET status = 'done', finished_at = ? WHERE id = ?",
+                (datetime.utcnow().isoformat(), window_id)
+            )
+        logging.info(f"📅 Backfill window {window['window_start']} → {window['window_end']} done")
+    except Exception as e:
+        logging.error(f"❌ Backfill window {window['window_start']} → {window['window_end']} failed: {e}")
+        with conn:
+            conn.execute(
+                "UPDATE backfill_windows SET status = 'failed', error = ? WHERE id = ?",
+                (str(e), window_id)
+            )
+
+
+def get_backfill_job(job_id: int):
+    """
+    Returns a job with its windows, progress and ETA, or None if it does not exist.
+    The ETA extrapolates the average duration of finished windows over the remaining ones.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.row_factory = sqlite3.Row
+        cursor.execute("SELECT * FROM backfill_jobs WHERE id = ?", (job_id,))
+        job = cursor.fetchone()
+        if job is None:
+            return None
+        cursor.execute("SELECT * FROM backfill_windows WHERE job_id = ? ORDER BY window_end DESC", (job_id,))
+        windows = [dict(row) for row in cursor.fetchall()]
+
+    job = dict(job)
+    job["refresh"] = bool(job["refresh"])
+    done = [window for window in windows if window["status"] == "done"]
+    remaining = len(windows) - len(done)
+
+    durations = [
+        (datetime.fromisoformat(window["finished_at"]) - datetime.fromisoformat(window["started_at"])).total_seconds()
+        for window in done if window["started_at"] and window["finished_at"]
+    ]
+    eta = None
+    if job["status"] == "running" and durations:
+        eta = round(sum(durations) / len(durations) * remaining / BACKFILL_PARALLEL_WINDOWS)
+
+    job.update({
+        "windows": windows,
+        "windows_total": len(windows),
+        "windows_done": len(done),
+        "windows_failed": sum(window["status"] == "failed" for window in windows),
+        "fetched": sum(window["fetched"] for window in windows),
+        "inserted": sum(window["inserted"] for window in windows),
+        "progress": round(len(done) / len(windows), 3) if windows else 1.0,
+        "eta_seconds": eta,
+    })
+    return job
+
+
+def list_backfill_jobs(limit: int = 20) -> list:
+    """
+    Returns the most recent jobs with progress, without their window details.
+    """
+    with get_connection() as conn:
+        rows = conn.execute("SELECT id FROM backfill_jobs ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+    job_ids = [row[0] for row in rows]
+
+    jobs = []
+    for job_id in job_ids:
+        job = get_backfill_job(job_id)
+        job.pop("windows")
+        jobs.append(job)
+    return jobs
+
+
+def _set_job_status(job_id: int, status: str):
+    with get_connection() as conn:
+        conn.execute(
+            "UPDATE backfill_jobs SET status = ?, updated_at = ? WHERE id = ?",
+            (status, datetime.utcnow().isoformat(), job_id)
+        )
+
+
+def _utc_epoch(day: str) -> int:
+    """
+    Epoch seconds of UTC midnight for an ISO date string.
+    """
+    return int(datetime.fromisoformat(day).replace(tzinfo=timezone.utc).timestamp())
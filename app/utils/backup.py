@@ -0,0 +1,250 @@
+# Standard library imports
+import os
+import gzip
+import shutil
+import sqlite3
+import logging
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+# Application-specific imports
+from app.utils.backfill import pause_backfills, resume_backfills
+from app.utils.database import get_db_path, recycle_connections, initialize_database
+from app.utils.write_queue import WRITE_QUEUE
+
+# Queued writes must be committed within this long before a restore swaps the file
+RESTORE_DRAIN_TIMEOUT_SECONDS = 30
+
+# Snapshots are gzipped copies of the database, newest kept up to BACKUP_RETENTION
+BACKUP_DIR = os.getenv("BACKUP_DIR", "/data/backups")
+BACKUP_RETENTION = int(os.getenv("BACKUP_RETENTION", "7"))
+
+# The online copy advances this many pages per step and sleeps between steps so
+# the scheduler's writers are never held up for long.
+BACKUP_PAGES_PER_STEP = int(os.getenv("BACKUP_PAGES_PER_STEP", "1024"))
+BACKUP_STEP_SLEEP_SECONDS = float(os.getenv("BACKUP_STEP_SLEEP_SECONDS", "0.01"))
+
+# A write from another connection restarts a stepped copy; after this many
+# restarts the rest is copied in one step, which in WAL mode still only holds a read snapshot.
+BACKUP_MAX_RESTARTS = 5
+
+BACKUP_PREFIX = "gmail-"
+BACKUP_SUFFIX = ".sqlite.gz"
+
+# One backup or restore at a time
+_backup_lock = threading.Lock()
+
+
+class _BackupRestarted(Exception):
+    pass
+
+
+def _backup_path(name: str) -> Path:
+    return Path(BACKUP_DIR) / name
+
+
+def _check_integrity(conn: sqlite3.Connection, quick: bool = False):
+    """
+    Raises ValueError unless PRAGMA integrity_check (or quick_check) reports ok.
+    """
+    pragma = "quick_check" if quick else "integrity_check"
+    problems = [row[0] for row in conn.execute(f"PRAGMA {pragma}").fetchall()]
+    if problems != ["ok"]:
+        raise ValueError(f"{pragma} failed: {'; '.join(problems[:5])}")
+
+
+def _copy_online(source_path: str, target_path: str) -> dict:
+    """
+    Copies a live database with the SQLite backup API in page chunks. Returns step stats.
+    """
+    stats = {"steps": 0, "restarts": 0, "pages": 0}
+    source = sqlite3.connect(source_path, timeout=30)
+    try:
+        def progress(status, remaining, total):
+            stats["steps"] += 1
+            stats["pages"] = total
+            if remaining > stats.get("remaining", remaining):
+                stats["restarts"] += 1
+                if stats["restarts"] >= BACKUP_MAX_RESTARTS:
+                    raise _BackupRestarted()
+            stats["remaining"] = remaining
+
+        target = sqlite3.connect(target_path)
+        try:
+            try:
+                source.backup(target, pages=BACKUP_PAGES_PER_STEP, progress=progress, sleep=BACKUP_STEP_SLEEP_SECONDS)
+            except _BackupRestarted:
+                logging.warning(f"⚠️ Backup restarted {stats['restarts']} times under concurrent writes; copying remainder in one step")
+                source.backup(target)
+            # Snapshots are single self-contained files
+            target.execute("PRAGMA journal_mode = DELETE")
+            _check_integrity(target, quick=True)
+        finally:
+            target.close()
+    finally:
+        source.close()
+    stats.pop("remaining", None)
+    return stats
+
+
+def _compress(source_path: Path, target_path: Path):
+    partial = target_path.with_name(target_path.name + ".partial")
+    with open(source_path, "rb") as raw, gzip.open(partial, "wb", compresslevel=6) as packed:
+        shutil.copyfileobj(raw, packed, 1024 * 1024)
+    os.replace(partial, target_path)
+
+
+def list_backups() -> list:
+    """
+    Returns the stored snapshots, newest first.
+
+    Returns:
+        list: [{"name": str, "size_bytes": int, "created_at": str}]
+    """
+    directory = Path(BACKUP_DIR)
+    if not directory.exists():
+        return []
+    backups = []
+    for path in directory.glob(f"{BACKUP_PREFIX}*{BACKUP_SUFFIX}"):
+        stat = path.stat()
+        backups.append({
+            "name": path.name,
+            "size_bytes": stat.st_size,
+            "created_at": datetime.utcfromtimestamp(stat.st_mtime).isoformat()
+        })
+    return sorted(backups, key=lambda backup: backup["name"], reverse=True)
+
+
+def rotate_backups(keep: int = BACKUP_RETENTION) -> list:
+    """
+    Deletes all but the newest `keep` snapshots. Returns the removed names.
+    """
+    removed = []
+    for backup in list_backups()[max(keep, 1):]:
+        _backup_path(backup["name"]).unlink(missing_ok=True)
+        removed.append(backup["name"])
+    if removed:
+        logging.info(f"🗑️ Rotated out {len(removed)} old backups")
+    return removed
+
+
+def _create_backup(tag: str = None) -> dict:
+    # Caller holds _backup_lock
+    started = time.perf_counter()
+    Path(BACKUP_DIR).mkdir(parents=True, exist_ok=True)
+    # Microseconds keep a manual backup and an immediate pre-restore snapshot apart
+    name = f"{BACKUP_PREFIX}{datetime.utcnow().strftime('%Y%m%d-%H%M%S-%f')}{f'-{tag}' if tag else ''}{BACKUP_SUFFIX}"
+    if _backup_path(name).exists():
+        raise FileExistsError(f"Backup already exists: {name}")
+    scratch = _backup_path(name[:-len(".gz")] + ".tmp")
+    try:
+        copy_stats = _copy_online(get_db_path(), str(scratch))
+        database_bytes = scratch.stat().st_size
+        _compress(scratch, _backup_path(name))
+    finally:
+        scratch.unlink(missing_ok=True)
+
+    result = {
+        "name": name,
+        "database_bytes": database_bytes,
+        "size_bytes": _backup_path(name).stat().st_size,
+        "seconds": round(time.perf_counter() - started, 3),
+        **copy_stats
+    }
+    logging.info(f"💾 Backup {name}: {database_bytes} → {result['size_bytes']} bytes in {result['seconds']}s ({copy_stats['steps']} steps)")
+    return result
+
+
+def create_backup() -> dict:
+    """
+    Takes a consistent snapshot of the live database without stopping writers,
+    verifies it, gzips it into BACKUP_DIR and rotates old snapshots.
+
+    Returns:
+        dict: {"name", "database_bytes", "size_bytes", "seconds", "steps", "restarts", "pages", "rotated"}
+    """
+    if not _backup_lock.acquire(blocking=False):
+        raise RuntimeError("A backup or restore is already running")
+    try:
+        result = _create_backup()
+        result["rotated"] = rotate_backups()
+        return result
+    finally:
+        _backup_lock.release()
+
+
+def restore_backup(name: str = None) -> dict:
+    """
+    Replaces the live database with a snapshot (by default the newest one that is not
+    a pre-restore safety copy).
+    The snapshot is decompressed and must pass PRAGMA integrity_check before the live
+    database is touched. Backfills and the write-behind queue are paused first, so no
+    write lands half in the old and half in the restored data; the restore is refused
+    while a backfill job is running or if queued writes cannot be committed. The
+    current database is snapshotted before the swap so a restore can itself be undone.
+
+    Returns:
+        dict: {"restored": str, "pre_restore_backup": str, "seconds": float}
+    """
+    available = {backup["name"] for backup in list_backups()}
+    if not available:
+        raise FileNotFoundError("No backups available")
+    name = name or max((backup for backup in available if "-pre-restore" not in backup), default=max(available))
+    if name not in available:
+        raise FileNotFoundError(f"Backup not found: {name}")
+
+    if not _backup_lock.acquire(blocking=False):
+        raise RuntimeError("A backup or restore is already running")
+    started = time.perf_counter()
+    scratch = _backup_path(name[:-len(".gz")] + ".restore")
+    try:
+        with gzip.open(_backup_path(name), "rb") as packed, open(scratch, "wb") as raw:
+            shutil.copyfileobj(packed, raw, 1024 * 1024)
+
+        snapshot = sqlite3.connect(scratch)
+        try:
+            _check_integrity(snapshot)
+            if not snapshot.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'emails'").fetchone():
+                raise ValueError(f"{name} is not a Synthia database")
+
+            if not pause_backfills():
+                raise RuntimeError("A backfill job is running; restore once it has finished")
+            try:
+                if not WRITE_QUEUE.pause(timeout=RESTORE_DRAIN_TIMEOUT_SECONDS):
+                    raise RuntimeError("Queued writes could not be committed; restore aborted")
+                try:
+                    # Taken after the queue drained, so it holds every acknowledged write
+                    safety = _create_backup(tag="pre-restore")
+
+                    # The backup API rewrites the file under SQLite's own locking, so
+                    # connections other threads hold stay valid and see the restored data
+                    live = sqlite3.connect(get_db_path(), timeout=30)
+                    try:
+                        snapshot.backup(live)
+                        live.execute("PRAGMA journal_mode = WAL")
+                        live.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                    finally:
+                        live.close()
+
+                    recycle_connections()
+                    # Older snapshots are brought up to the current schema
+                    initialize_database()
+                finally:
+                    WRITE_QUEUE.resume()
+            finally:
+                resume_backfills()
+        finally:
+            snapshot.close()
+    finally:
+        scratch.unlink(missing_ok=True)
+        _backup_lock.release()
+
+    result = {
+        "restored": name,
+        "pre_restore_backup": safety["name"],
+        "seconds": round(time.perf_counter() - started, 3)
+    }
+    logging.info(f"♻️ Restored database from {name} in {result['seconds']}s (previous state saved as {safety['name']})")
+    return result
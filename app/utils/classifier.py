@@ -3,24 +3,23 @@ import os
 import logging
 import time
 import json
-import sqlite3
-from datetime import datetime  # Add this import
 
 # Third-party imports
 import openai
 import dns.resolver
-from joblib import load
+import numpy as np
 from collections import Counter
 from fastapi import APIRouter
 
 # Application-specific imports
-from app.utils.database import get_db_path
-from app.utils.database import save_system_value  # Ensure this import is present
+from app.utils.database import get_connection
+from app.utils.write_queue import queue_classifications
 from app.utils.trainer import combine_features
+from app.utils.model_cache import get_local_model_versioned
+from app.utils.prediction_telemetry import record_predictions
 
 # Constants
 openai.api_key = os.getenv("OPENAI_API_KEY")
-db_path = get_db_path()
 MODEL_PATH = "/data/local_classifier.joblib"
 router = APIRouter()
 
@@ -35,16 +34,13 @@ def classify_email_batch(batch=None):
 
         # Use the provided batch or fetch unclassified emails
         if batch is None:
-            conn = sqlite3.connect(db_path)
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT id, sender, sender_email, subject, category
-                FROM emails
-                WHERE category IS NULL OR category = 'Uncategorized'
-                LIMIT 100
-            """)
-            rows = cursor.fetchall()
-            conn.close()
+            with get_connection() as conn:
+                rows = conn.execute("""
+                    SELECT id, sender, sender_email, subject, category
+                    FROM emails
+                    WHERE category IS NULL OR category = 'Uncategorized'
+                    LIMIT 100
+                """).fetchall()
 
             if not rows:
                 logging.info("No unclassified emails to process.")
@@ -62,17 +58,14 @@ def classify_email_batch(batch=None):
 
         # Filter using Spamhaus
         emails_to_classify = []
+        spam_flagged = []
         for email in batch:
             email_id, sender_name, sender_email, subject = email["id"], email["sender_name"], email["sender_email"], email["subject"]
             logging.debug(f"📨 Queued: {email_id} | {sender_name} <{sender_email}> | Subject: {subject}")
 
             if check_sender_spamhaus(sender_email):
                 logging.info(f"⚠️ Skipping {sender_email} (Spamhaus match)")
-                conn = sqlite3.connect(db_path)
-                cursor = conn.cursor()
-                cursor.execute("UPDATE emails SET category = ? WHERE id = ?", ("Suspected Spam", email_id))
-                conn.commit()
-                conn.close()
+                spam_flagged.append((email_id, "Suspected Spam", "spamhaus", None))
             else:
                 emails_to_classify.append({
                     "id": email_id,
@@ -81,6 +74,8 @@ def classify_email_batch(batch=None):
                     "subject": subject
                 })
 
+        queue_classifications(spam_flagged)
+
         if not emails_to_classify:
             logging.info("✅ All emails flagged as spam. Nothing sent to OpenAI.")
             return []
@@ -147,17 +142,12 @@ def classify_email_batch(batch=None):
             "Confirmed Spam", "Phishing", "Blacklisted"
         }
 
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
+        updates = []
         for item in parsed:
             raw_category = item.get("category", "").strip().title()
             category = raw_category if raw_category in VALID_CATEGORIES else "Flagged For Review"
-            cursor.execute(
-                "UPDATE emails SET category = ?, predicted_by = ? WHERE id = ?",
-                (category, "openai", item["id"])
-            )
-        conn.commit()
-        conn.close()
+            updates.append((item["id"], category, "openai", None))
+        queue_classifications(updates)
         summary = Counter(item.get("category", "Uncategorized") for item in parsed)
         summary_str = ", ".join(f"{label}: {count}" for label, count in summary.items())
         logging.info(f"✅ Classified {len(parsed)} emails.")
@@ -192,25 +182,42 @@ def check_sender_spamhaus(email):
         logging.warning(f"Spamhaus lookup failed for {domain}: {e}")
         return False  # On error, treat as not spammy
 
-def predict_with_local_model(sender, sender_email, subject):
+def predict_many(emails):
     """
-    Predicts the category of an email using a local machine learning model.
-    Updates the system table with the last prediction timestamp.
+    Classifies a batch of (sender, sender_email, subject) tuples with the local model
+    in one vectorized pass: the texts are transformed once and a single predict_proba
+    call yields both the labels (argmax) and the confidences (row max).
+    The batch is added to the in-memory prediction telemetry.
 
     Returns:
-        tuple: (Predicted label, confidence percentage), or (None, None) if model is missing.
+        tuple: (labels array, confidence percentage array, model version),
+            or (None, None, None) if model is missing.
     """
-    if not os.path.exists(MODEL_PATH):
-        return None, None
+    model, version = get_local_model_versioned()
+    if model is None:
+        return None, None, None
+    if not emails:
+        return np.array([], dtype=object), np.array([], dtype=int), version
 
-    model = load(MODEL_PATH)
-    input_text = combine_features(sender, sender_email, subject)
-    predicted_label = model.predict([input_text])[0]
-    predicted_proba = model.predict_proba([input_text])[0]
-    confidence = max(predicted_proba)
+    started = time.perf_counter()
+    texts = [combine_features(sender, sender_email, subject) for sender, sender_email, subject in emails]
+    proba = model.predict_proba(texts)
+    best = proba.argmax(axis=1)
+    labels = model.classes_[best]
+    confidences = np.rint(proba[np.arange(len(best)), best] * 100).astype(int)
 
-    # ✅ Save last prediction timestamp
-    save_system_value("local_model_last_prediction", datetime.utcnow().isoformat())
+    record_predictions(labels, confidences, version, time.perf_counter() - started)
 
-    return predicted_label, round(confidence * 100)
+    return labels, confidences, version
 
+def predict_with_local_model(sender, sender_email, subject):
+    """
+    Predicts the category of a single email using the cached local machine learning model.
+
+    Returns:
+        tuple: (Predicted label, confidence percentage), or (None, None) if model is missing.
+    """
+    labels, confidences, _ = predict_many([(sender, sender_email, subject)])
+    if labels is None:
+        return None, None
+    return labels[0], int(confidences[0])
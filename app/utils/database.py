@@ -1,12 +1,60 @@
 # Standard library imports
 from pathlib import Path
+import os
 import sqlite3
 import json
-from datetime import datetime
+import logging
+import threading
+import time
+from datetime import datetime, date
+
+# Application-specific imports
+from app.utils.migrations import apply_migrations, check_query_plans
 
 # Path to the SQLite database
 DB_PATH = "/data/gmail.sqlite"
 
+# Connection tuning applied to every pooled connection. WAL lets readers run
+# alongside the single writer; NORMAL sync is durable across app crashes in WAL mode.
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE_KB = 16 * 1024
+SQLITE_STATEMENT_CACHE = 256
+
+# High-frequency system keys written at most once per this many seconds; the
+# latest value is always served from memory and flushed at shutdown.
+COALESCED_SYSTEM_KEYS = {
+    "local_model_last_prediction": 5.0,
+}
+
+# One persistent connection per thread, keyed by thread ident
+_connections = {}
+_connections_lock = threading.Lock()
+_local = threading.local()
+_generation = 0
+
+# Stays under SQLITE_MAX_VARIABLE_NUMBER on older SQLite builds (999)
+ID_LOOKUP_CHUNK = 500
+
+# "update" refreshes stored content for known ids, "ignore" keeps the stored row untouched
+UPSERT_SQL = {
+    "update": """
+        INSERT INTO emails (id, sender, sender_email, subject, body, received_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(id) DO UPDATE SET
+            sender = excluded.sender,
+            sender_email = excluded.sender_email,
+            subject = excluded.subject,
+            body = excluded.body,
+            received_at = excluded.received_at
+    """,
+    "ignore": """
+        INSERT OR IGNORE INTO emails (
+            id, sender, sender_email, subject, body, received_at, category, predicted_by
+        ) VALUES (?, ?, ?, ?, ?, ?, 'Uncategorized', NULL)
+    """,
+}
+
 # Fixed set of classification labels
 LABELS = [
     ("Important", "High-priority or time-sensitive email"),
@@ -33,12 +81,83 @@ def get_db_path():
     """
     return DB_PATH
 
+def _open_connection(path: str) -> sqlite3.Connection:
+    """
+    Opens a connection with the pragmas every caller relies on.
+    """
+    conn = sqlite3.connect(
+        path,
+        timeout=SQLITE_BUSY_TIMEOUT_MS / 1000,
+        cached_statements=SQLITE_STATEMENT_CACHE,
+        check_same_thread=False  # only so close_all_connections can close it from another thread
+    )
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute(f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT_MS}")
+    conn.execute(f"PRAGMA mmap_size = {SQLITE_MMAP_SIZE}")
+    conn.execute(f"PRAGMA cache_size = -{SQLITE_CACHE_SIZE_KB}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    return conn
+
+def get_connection() -> sqlite3.Connection:
+    """
+    Returns this thread's persistent connection to the database, opening it on first use.
+    Use it as `with get_connection() as conn:` so the block commits on success and rolls
+    back on error. Never close it; the pool owns it.
+    """
+    path = get_db_path()
+    conn = getattr(_local, "conn", None)
+    if conn is not None and _local.path == path and _local.generation == _generation:
+        return conn
+
+    conn = _open_connection(path)
+    thread = threading.current_thread()
+    with _connections_lock:
+        # Drop connections whose threads have exited (e.g. finished backfill workers)
+        for ident, (owner, stale) in list(_connections.items()):
+            if not owner.is_alive() or ident == thread.ident:
+                stale.close()
+                del _connections[ident]
+        _connections[thread.ident] = (thread, conn)
+    _local.conn = conn
+    _local.path = path
+    _local.generation = _generation
+    return conn
+
+def close_all_connections():
+    """
+    Closes every pooled connection; each thread reconnects on its next get_connection().
+    Called at shutdown and before the database file is replaced.
+    """
+    global _generation
+    _system_cache.reset()
+    with _connections_lock:
+        _generation += 1
+        for ident, (owner, conn) in list(_connections.items()):
+            try:
+                conn.close()
+            except sqlite3.Error as e:
+                logging.warning(f"⚠️ Failed to close connection of {owner.name}: {e}")
+        _connections.clear()
+
+def recycle_connections():
+    """
+    Makes every thread open a fresh connection on its next get_connection(), without
+    closing connections other threads may be using mid-operation; each old connection
+    is closed by its own thread when it reconnects, or once that thread has exited.
+    Called after the database contents were replaced in place.
+    """
+    global _generation
+    _system_cache.reset()
+    with _connections_lock:
+        _generation += 1
+
 def initialize_database():
     """
     Initializes the SQLite database and creates required tables and labels.
     """
-    Path("/data").mkdir(exist_ok=True)
-    conn = sqlite3.connect(DB_PATH)
+    Path(get_db_path()).parent.mkdir(exist_ok=True)
+    conn = _open_connection(get_db_path())
     cursor = conn.cursor()
 
     # Enable foreign key constraints
@@ -91,7 +210,6 @@ def initialize_database():
     CREATE TABLE IF NOT EXISTS sender_reputation (
         sender_email TEXT PRIMARY KEY,
         sender_name TEXT,
-        classification_counts TEXT DEFAULT '{}',
         reputation_score REAL DEFAULT 0.0,
         manual_override TEXT DEFAULT NULL,
         origin_sources TEXT DEFAULT '[]',
@@ -100,72 +218,254 @@ def initialize_database():
     )
     """)
 
+    # Create backfill job tables (resumable, windowed historical imports)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS backfill_jobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        start_date TEXT,
+        end_date TEXT,
+        window_days INTEGER,
+        on_conflict TEXT DEFAULT 'update',
+        refresh INTEGER DEFAULT 0,
+        status TEXT DEFAULT 'pending',
+        created_at TIMESTAMP,
+        updated_at TIMESTAMP
+    )
+    """)
+
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS backfill_windows (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        job_id INTEGER,
+        window_start TEXT,
+        window_end TEXT,
+        status TEXT DEFAULT 'pending',
+        page_token TEXT DEFAULT NULL,
+        pages INTEGER DEFAULT 0,
+        fetched INTEGER DEFAULT 0,
+        inserted INTEGER DEFAULT 0,
+        error TEXT DEFAULT NULL,
+        started_at TIMESTAMP DEFAULT NULL,
+        finished_at TIMESTAMP DEFAULT NULL,
+        FOREIGN KEY(job_id) REFERENCES backfill_jobs(id)
+    )
+    """)
+
     conn.commit()
+
+    # Indexes and later schema changes are versioned migrations
+    version = apply_migrations(conn)
+    logging.info(f"🗄️ Database schema at version {version}")
+    check_query_plans(conn)
     conn.close()
 
-def update_sender_reputation(sender_email, sender_name, classification):
+def get_existing_email_ids(email_ids) -> set:
     """
-    Updates or inserts sender reputation based on a classification.
-    Tracks category counts, score, and state.
+    Returns the subset of the given message ids that are already stored in `emails`.
+    Looks ids up in chunks so a whole listing page costs a single indexed query.
     """
-    try:
-        conn = sqlite3.connect(get_db_path())
+    email_ids = list(email_ids)
+    if not email_ids:
+        return set()
+
+    existing = set()
+    with get_connection() as conn:
         cursor = conn.cursor()
+        for start in range(0, len(email_ids), ID_LOOKUP_CHUNK):
+            chunk = email_ids[start:start + ID_LOOKUP_CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            cursor.execute(f"SELECT id FROM emails WHERE id IN ({placeholders})", chunk)
+            existing.update(row[0] for row in cursor.fetchall())
+    return existing
 
-        # Retrieve existing counts and manual override flag
-        cursor.execute("""
-            SELECT classification_counts, manual_override
-            FROM sender_reputation
-            WHERE sender_email = ?
-        """, (sender_email,))
-        row = cursor.fetchone()
-        now = datetime.utcnow().isoformat()
-
-        if row:
-            counts = json.loads(row[0])
-            counts[classification] = counts.get(classification, 0) + 1
-            manual_override = bool(row[1])
-        else:
-            counts = {classification: 1}
-            manual_override = False
-
-        score = calculate_reputation_score(counts, manual_override)
-        state = determine_reputation_state(score)
-
-        if row:
-            cursor.execute("""
-                UPDATE sender_reputation
-                SET classification_counts = ?, sender_name = ?, last_updated = ?,
-                    reputation_score = ?, reputation_state = ?
-                WHERE sender_email = ?
-            """, (
-                json.dumps(counts),
-                sender_name,
-                now,
-                score,
-                state,
-                sender_email
-            ))
+def _write_stats(rows: int, changed: int, started: float) -> dict:
+    elapsed = time.perf_counter() - started
+    return {
+        "rows": rows,
+        "changed": changed,
+        "seconds": round(elapsed, 4),
+        "rows_per_sec": round(rows / elapsed) if elapsed > 0 else rows,
+    }
+
+def bulk_upsert_emails(emails, on_conflict: str = "update", received_before: date = None) -> dict:
+    """
+    Writes parsed emails (as returned by GmailService) with a single executemany
+    in one transaction. Emails without a received_at, or received on or after
+    `received_before`, are skipped.
+
+    Returns:
+        dict: {"rows": int, "changed": int, "seconds": float, "rows_per_sec": int}
+    """
+    started = time.perf_counter()
+    params = [
+        (
+            email.get("id"),
+            email.get("sender"),
+            email.get("email"),
+            email.get("subject"),
+            email.get("body", ""),
+            email["received_at"],
+        )
+        for email in emails
+        if email.get("received_at") and not (
+            received_before and datetime.fromisoformat(email["received_at"]).date() >= received_before
+        )
+    ]
+    if not params:
+        return _write_stats(0, 0, started)
+
+    with get_connection() as conn:
+        cursor = conn.executemany(UPSERT_SQL[on_conflict], params)
+        changed = cursor.rowcount
+    return _write_stats(len(params), changed, started)
+
+def get_email_counters() -> dict:
+    """
+    Returns trigger-maintained email totals in O(1), independent of mailbox size.
+
+    Returns:
+        dict: {"total": int, "unclassified": int, "by_category": {label: int},
+               "by_predicted_by": {source: int}}
+    """
+    with get_connection() as conn:
+        rows = conn.execute("SELECT dimension, value, count FROM email_counters WHERE count != 0").fetchall()
+
+    counters = {"total": 0, "by_category": {}, "by_predicted_by": {}}
+    for dimension, value, count in rows:
+        if dimension == "total":
+            counters["total"] = count
         else:
-            cursor.execute("""
-                INSERT INTO sender_reputation (
-                    sender_email, sender_name, classification_counts,
-                    last_updated, reputation_score, reputation_state
-                ) VALUES (?, ?, ?, ?, ?, ?)
-            """, (
-                sender_email,
-                sender_name,
-                json.dumps(counts),
-                now,
-                score,
-                state
-            ))
-
-        conn.commit()
-        conn.close()
-
-    except Exception as e:
-        print(f"⚠️ Error updating sender reputation for {sender_email}: {e}")
+            counters[f"by_{dimension}"][value or None] = count
+    counters["unclassified"] = (
+        counters["by_category"].get(None, 0) + counters["by_category"].get("Uncategorized", 0)
+    )
+    return counters
+
+def apply_reputation_increments(cursor, increments: dict):
+    """
+    Adds label counts for many senders inside the caller's transaction: one UPSERT
+    increment per (sender, label), then one score/state refresh per touched sender.
+
+    Args:
+        increments: {sender_email: (sender_name, {label: count})}
+    """
+    if not increments:
+        return
+    now = datetime.utcnow().isoformat()
+
+    cursor.executemany("""
+        INSERT INTO sender_label_counts (sender_email, label, count)
+        VALUES (?, ?, ?)
+        ON CONFLICT(sender_email, label) DO UPDATE SET count = count + excluded.count
+    """, [
+        (sender_email, label, count)
+        for sender_email, (_, labels) in increments.items()
+        for label, count in labels.items()
+    ])
+    cursor.executemany("""
+        INSERT INTO sender_reputation (sender_email, sender_name, last_updated)
+        VALUES (?, ?, ?)
+        ON CONFLICT(sender_email) DO UPDATE SET
+            sender_name = COALESCE(excluded.sender_name, sender_name),
+            last_updated = excluded.last_updated
+    """, [(sender_email, sender_name, now) for sender_email, (sender_name, _) in increments.items()])
+
+    refresh_reputation_scores(cursor, list(increments))
+
+def refresh_reputation_scores(cursor, sender_emails):
+    """
+    Recomputes reputation_score and reputation_state from sender_label_counts.
+    """
+    sender_emails = list(sender_emails)
+    updates = []
+    for start in range(0, len(sender_emails), ID_LOOKUP_CHUNK):
+        chunk = sender_emails[start:start + ID_LOOKUP_CHUNK]
+        placeholders = ",".join("?" * len(chunk))
+        cursor.execute(f"""
+            SELECT r.sender_email, r.manual_override, c.label, c.count
+            FROM sender_reputation r
+            LEFT JOIN sender_label_counts c ON c.sender_email = r.sender_email
+            WHERE r.sender_email IN ({placeholders})
+        """, chunk)
+
+        senders = {}
+        for sender_email, manual_override, label, count in cursor.fetchall():
+            override, counts = senders.setdefault(sender_email, (bool(manual_override), {}))
+            if label is not None:
+                counts[label] = count
+
+        for sender_email, (manual_override, counts) in senders.items():
+            score = calculate_reputation_score(counts, manual_override)
+            updates.append((score, determine_reputation_state(score), sender_email))
+
+    cursor.executemany(
+        "UPDATE sender_reputation SET reputation_score = ?, reputation_state = ? WHERE sender_email = ?",
+        updates
+    )
+
+def rebuild_sender_label_counts(sender_email: str = None) -> int:
+    """
+    Replaces stored label counts with a fresh aggregate of classified emails, for one
+    sender or for every sender with stored mail, and refreshes their scores.
+    Returns the number of senders rebuilt.
+    """
+    scope, params = ("AND sender_email = ?", (sender_email,)) if sender_email else ("", ())
+    now = datetime.utcnow().isoformat()
+
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        # Senders whose mail has all aged out keep their accumulated counts
+        cursor.execute(f"""
+            DELETE FROM sender_label_counts
+            WHERE sender_email IN (
+                SELECT sender_email FROM emails
+                WHERE sender_email IS NOT NULL AND category IS NOT NULL {scope}
+            )
+        """, params)
+        cursor.execute(f"""
+            INSERT INTO sender_label_counts (sender_email, label, count)
+            SELECT sender_email, category, COUNT(*)
+            FROM emails
+            WHERE sender_email IS NOT NULL AND category IS NOT NULL {scope}
+            GROUP BY sender_email, category
+        """, params)
+        # MAX(sender) picks one display name per address
+        cursor.execute(f"""
+            INSERT INTO sender_reputation (sender_email, sender_name, last_updated)
+            SELECT sender_email, MAX(sender), ?
+            FROM emails
+            WHERE sender_email IS NOT NULL AND category IS NOT NULL {scope}
+            GROUP BY sender_email
+            ON CONFLICT(sender_email) DO UPDATE SET
+                sender_name = excluded.sender_name,
+                last_updated = excluded.last_updated
+        """, (now, *params))
+        cursor.execute(f"""
+            SELECT DISTINCT sender_email FROM emails
+            WHERE sender_email IS NOT NULL AND category IS NOT NULL {scope}
+        """, params)
+        senders = [row[0] for row in cursor.fetchall()]
+        refresh_reputation_scores(cursor, senders)
+
+    logging.info(f"🧮 Rebuilt label counts for {len(senders)} senders")
+    return len(senders)
+
+def get_label_rollup() -> list:
+    """
+    Totals per label across all senders.
+
+    Returns:
+        list: [{"label": str, "emails": int, "senders": int}]
+    """
+    with get_connection() as conn:
+        rows = conn.execute("""
+            SELECT label, SUM(count), COUNT(*)
+            FROM sender_label_counts
+            WHERE count > 0
+            GROUP BY label
+            ORDER BY SUM(count) DESC
+        """).fetchall()
+    return [{"label": label, "emails": emails, "senders": senders} for label, emails, senders in rows]
 
 def calculate_reputation_score(counts: dict, manual_override: bool = False) -> float:
     """
@@ -210,49 +510,129 @@ def ensure_system_table():
     """
     Ensures the 'system' table exists for storing key-value system metadata.
     """
-    conn = sqlite3.connect(get_db_path())
-    cursor = conn.cursor()
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS system (
-            key TEXT PRIMARY KEY,
-            value TEXT
-        )
-    """)
-    conn.commit()
-    conn.close()
+    with get_connection() as conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS system (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            )
+        """)
+
+class SystemCache:
+    """
+    Process-wide write-through cache of the `system` table, stored as raw JSON so
+    callers always get their own copy. Reads are served from memory; the whole
+    (small) table is reloaded when PRAGMA data_version shows another connection
+    committed. Keys in COALESCED_SYSTEM_KEYS are persisted at most once per interval.
+    """
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.conn = None
+        self.path = None
+        self.data_version = None
+        self.values = {}
+        self.dirty = {}
+        self.persisted_at = {}
+        self.timer = None
+        self.stats = {"hits": 0, "reloads": 0, "writes": 0, "coalesced": 0}
+
+    def _sync(self):
+        # Caller holds the lock
+        path = get_db_path()
+        if self.conn is None or self.path != path:
+            self._close()
+            self.conn = _open_connection(path)
+            self.path = path
+        data_version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        if data_version != self.data_version:
+            rows = self.conn.execute("SELECT key, value FROM system").fetchall()
+            self.values = dict(rows)
+            self.values.update(self.dirty)
+            self.data_version = data_version
+            self.stats["reloads"] += 1
+        else:
+            self.stats["hits"] += 1
+
+    def get(self, key: str):
+        with self.lock:
+            self._sync()
+            raw = self.values.get(key)
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key: str, value):
+        raw = json.dumps(value)
+        with self.lock:
+            self._sync()
+            self.values[key] = raw
+            interval = COALESCED_SYSTEM_KEYS.get(key)
+            if interval and time.monotonic() - self.persisted_at.get(key, 0) < interval:
+                self.dirty[key] = raw
+                self.stats["coalesced"] += 1
+                if self.timer is None:
+                    self.timer = threading.Timer(interval, self.flush)
+                    self.timer.daemon = True
+                    self.timer.start()
+                return
+            self.dirty.pop(key, None)
+            self._write({key: raw})
+
+    def flush(self):
+        """
+        Persists coalesced values that have not been written yet.
+        """
+        with self.lock:
+            self.timer = None
+            if self.dirty and self.conn is not None:
+                pending, self.dirty = self.dirty, {}
+                self._write(pending)
+
+    def _write(self, items: dict):
+        with self.conn:
+            self.conn.executemany("""
+                INSERT INTO system (key, value)
+                VALUES (?, ?)
+                ON CONFLICT(key) DO UPDATE SET value = excluded.value
+            """, list(items.items()))
+        now = time.monotonic()
+        for key in items:
+            self.persisted_at[key] = now
+        self.stats["writes"] += 1
+
+    def reset(self):
+        """
+        Flushes pending values and drops the cache and its connection.
+        """
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+            self.flush()
+            self._close()
+            self.values = {}
+            self.data_version = None
+
+    def _close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+_system_cache = SystemCache()
+
 def save_system_value(key: str, value):
     """
     Saves or updates a system-wide setting in the 'system' table.
     """
-    import sqlite3
-    import json
-    from app.utils.database import get_db_path  # or remove if already in same file
-
-    conn = sqlite3.connect(get_db_path())
-    cursor = conn.cursor()
-    cursor.execute("""
-        INSERT INTO system (key, value)
-        VALUES (?, ?)
-        ON CONFLICT(key) DO UPDATE SET value = excluded.value
-    """, (key, json.dumps(value)))
-    conn.commit()
-    conn.close()
+    _system_cache.set(key, value)
 
 def get_system_value(key: str):
     """
     Retrieves the value of a system-wide setting from the 'system' table.
     Returns None if the key is not found.
     """
-    import sqlite3
-    import json
-    from app.utils.database import get_db_path  # adjust if local
-
-    conn = sqlite3.connect(get_db_path())
-    cursor = conn.cursor()
-    cursor.execute("SELECT value FROM system WHERE key = ?", (key,))
-    row = cursor.fetchone()
-    conn.close()
+    return _system_cache.get(key)
 
-    if row:
-        return json.loads(row[0])
-    return None
+def get_system_cache_stats() -> dict:
+    """
+    Returns hit/reload/write counters of the system table cache.
+    """
+    return dict(_system_cache.stats)
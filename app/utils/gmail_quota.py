@@ -0,0 +1,97 @@
+# Standard library imports
+import os
+import random
+import threading
+import time
+
+# Third-party imports
+from googleapiclient.errors import HttpError
+
+# Gmail per-user quota: 250 quota units per second, charged per method call.
+# https://developers.google.com/gmail/api/reference/quota
+QUOTA_UNITS_PER_SECOND = int(os.getenv("GMAIL_QUOTA_UNITS_PER_SEC", "250"))
+QUOTA_UNITS = {
+    "messages.get": 5,
+    "messages.list": 5,
+    "history.list": 2,
+    "labels.get": 1,
+    "getProfile": 1,
+}
+
+# Retry policy for rate-limit and transient server errors
+MAX_RETRIES = 6
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 32.0
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+RATE_LIMIT_REASONS = {"rateLimitExceeded", "userRateLimitExceeded"}
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket that paces callers to a sustained rate of quota units.
+    Requests larger than the bucket capacity are allowed once the bucket is full
+    and leave it in debt, so a 100-message batch never blocks forever.
+    """
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+        self.waits = 0
+
+    def acquire(self, units: float = 1) -> float:
+        """
+        Blocks until `units` can be spent. Returns the number of seconds waited.
+        """
+        waited = 0.0
+        needed = min(units, self.capacity)
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= needed:
+                    self.tokens -= units
+                    if waited:
+                        self.waits += 1
+                    return waited
+                delay = (needed - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+# Shared by every GmailService in the process since the quota is per user, not per client
+GMAIL_QUOTA = TokenBucket(QUOTA_UNITS_PER_SECOND)
+
+
+def is_rate_limited(error: Exception) -> bool:
+    """
+    True for 429 responses and 403 responses carrying a rate-limit reason.
+    """
+    if not isinstance(error, HttpError):
+        return False
+    status = error.resp.status
+    if status == 429:
+        return True
+    if status == 403:
+        details = getattr(error, "error_details", None) or []
+        reasons = {detail.get("reason") for detail in details if isinstance(detail, dict)}
+        return bool(reasons & RATE_LIMIT_REASONS) or "rateLimitExceeded" in str(error)
+    return False
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    True for rate limits, transient 5xx responses and connection-level failures.
+    """
+    if isinstance(error, HttpError):
+        return error.resp.status in RETRYABLE_STATUSES or is_rate_limited(error)
+    return isinstance(error, (ConnectionError, TimeoutError, OSError))
+
+
+def backoff_delay(attempt: int) -> float:
+    """
+    Exponential backoff with full jitter for the given 1-based retry attempt.
+    """
+    return random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * (2 ** (attempt - 1))))
@@ -0,0 +1,37 @@
+# Standard library imports
+import logging
+from datetime import date
+
+# Application-specific imports
+from app.utils.database import bulk_upsert_emails
+
+
+def ingest_email_pages(pages, on_conflict: str = "update", received_before: date = None) -> dict:
+    """
+    Writes pages of parsed emails to SQLite, committing each page in its own transaction
+    as it arrives so rows are visible immediately and a late failure keeps earlier pages.
+
+    Args:
+        pages: Iterable of email lists, or of (emails, next_page_token) tuples as yielded
+            by GmailService.iter_emails.
+        on_conflict (str): "update" to refresh existing rows, "ignore" to keep them.
+        received_before (date): Skip emails received on or after this UTC date.
+
+    Returns:
+        dict: {"fetched": int, "inserted": int, "pages": int}
+    """
+    fetched = inserted = page_count = 0
+
+    for page in pages:
+        emails = page[0] if isinstance(page, tuple) else page
+        page_count += 1
+        fetched += len(emails)
+
+        stats = bulk_upsert_emails(emails, on_conflict=on_conflict, received_before=received_before)
+        inserted += stats["changed"]
+        logging.info(
+            f"💾 Page {page_count}: stored {inserted}/{fetched} emails so far "
+            f"({stats['rows_per_sec']} rows/s)"
+        )
+
+    return {"fetched": fetched, "inserted": inserted, "pages": page_count}
@@ -0,0 +1,114 @@
+# Standard library imports
+import base64
+import json
+
+# Application-specific imports
+from app.utils.database import get_connection
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+# Each view selects only what it renders; list views never read full message bodies.
+LIST_COLUMNS = (
+    "id", "sender", "sender_email", "subject", "category",
+    "received_at", "predicted_by", "confidence"
+)
+MANUAL_REVIEW_COLUMNS = LIST_COLUMNS + ("substr(body, 1, 100) AS snippet",)
+
+
+def encode_cursor(received_at: str, email_id: str) -> str:
+    """
+    Opaque cursor pointing just past the given row in (received_at, id) DESC order.
+    """
+    return base64.urlsafe_b64encode(json.dumps([received_at, email_id]).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """
+    Reverses encode_cursor. Raises ValueError for malformed cursors.
+    """
+    try:
+        received_at, email_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+    return received_at, email_id
+
+
+def build_email_page_query(cursor: str = None, limit: int = DEFAULT_PAGE_SIZE, category: str = None,
+                           exclude_categories=None, sender: str = None, predicted_by: str = None,
+                           min_confidence: float = None, max_confidence: float = None,
+                           require_predicted_by: bool = False, columns: tuple = LIST_COLUMNS) -> tuple:
+    """
+    Builds the keyset page query list_email_page runs, fetching one row past `limit`
+    to tell whether another page exists. All filters are bound parameters.
+    The startup query-plan check explains these same queries.
+
+    Returns:
+        tuple: (sql, params)
+    """
+    conditions, params = [], []
+
+    if cursor:
+        conditions.append("(received_at, id) < (?, ?)")
+        params.extend(decode_cursor(cursor))
+    if category:
+        conditions.append("category = ?")
+        params.append(category)
+    if exclude_categories:
+        conditions.append(f"category NOT IN ({','.join('?' * len(exclude_categories))})")
+        params.extend(exclude_categories)
+    if sender:
+        conditions.append("sender_email = ?")
+        params.append(sender)
+    if predicted_by:
+        conditions.append("predicted_by = ?")
+        params.append(predicted_by)
+    if require_predicted_by:
+        conditions.append("predicted_by IS NOT NULL")
+    if min_confidence is not None:
+        conditions.append("confidence >= ?")
+        params.append(min_confidence)
+    if max_confidence is not None:
+        conditions.append("confidence <= ?")
+        params.append(max_confidence)
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    sql = f"""
+        SELECT {', '.join(columns)}
+        FROM emails
+        {where}
+        ORDER BY received_at DESC, id DESC
+        LIMIT ?
+    """
+    return sql, (*params, limit + 1)
+
+
+def list_email_page(cursor: str = None, limit: int = DEFAULT_PAGE_SIZE, category: str = None,
+                    exclude_categories=None, sender: str = None, predicted_by: str = None,
+                    min_confidence: float = None, max_confidence: float = None,
+                    require_predicted_by: bool = False, columns: tuple = LIST_COLUMNS) -> dict:
+    """
+    Returns one page of emails, newest first, using keyset pagination on
+    (received_at, id): each page seeks straight to the cursor through the index,
+    so page 1000 costs the same as page 1.
+    `columns` are SQL expressions; "expr AS name" is returned under `name`.
+
+    Returns:
+        dict: {"emails": [dict], "next_cursor": str or None}
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    sql, params = build_email_page_query(
+        cursor=cursor, limit=limit, category=category, exclude_categories=exclude_categories,
+        sender=sender, predicted_by=predicted_by, min_confidence=min_confidence,
+        max_confidence=max_confidence, require_predicted_by=require_predicted_by, columns=columns
+    )
+    with get_connection() as conn:
+        rows = conn.execute(sql, params).fetchall()
+
+    names = [column.rsplit(" AS ", 1)[-1] for column in columns]
+    emails = [dict(zip(names, row)) for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        last = emails[-1]
+        next_cursor = encode_cursor(last["received_at"], last["id"])
+    return {"emails": emails, "next_cursor": next_cursor}
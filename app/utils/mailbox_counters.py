@@ -0,0 +1,94 @@
+# Standard library imports
+import logging
+from datetime import datetime
+
+# Application-specific imports
+from app.utils.database import get_system_value, save_system_value
+
+# Cached Gmail label counters live in the system table under this key
+COUNTERS_KEY = "mailbox_counters"
+TRACKED_LABELS = ("INBOX", "UNREAD")
+
+# Sync deltas keep the cache current between authoritative refreshes; this
+# bounds how long drift from missed or partial history records can survive.
+COUNTERS_MAX_AGE_SECONDS = 6 * 3600
+
+
+def refresh_mailbox_counters(gmail) -> dict:
+    """
+    Reads messagesTotal/messagesUnread for the tracked system labels from Gmail
+    (one labels.get call each) and stores them as the new cached baseline.
+    """
+    now = datetime.utcnow().isoformat()
+    counters = {
+        "labels": gmail.get_label_counts(TRACKED_LABELS),
+        "refreshed_at": now,
+        "updated_at": now,
+    }
+    save_system_value(COUNTERS_KEY, counters)
+    logging.info(f"📬 Mailbox counters refreshed: {counters['labels']}")
+    return counters
+
+
+def apply_label_deltas(label_deltas: dict):
+    """
+    Applies counter deltas derived from a history sync to the cached values.
+    Does nothing if there is no baseline yet.
+    """
+    counters = get_system_value(COUNTERS_KEY)
+    if not counters or not counters.get("refreshed_at"):
+        return None
+
+    for label, delta in label_deltas.items():
+        values = counters["labels"].setdefault(label, {"messagesTotal": 0, "messagesUnread": 0})
+        for field, change in delta.items():
+            values[field] = max(0, values.get(field, 0) + change)
+
+    counters["updated_at"] = datetime.utcnow().isoformat()
+    save_system_value(COUNTERS_KEY, counters)
+    return counters
+
+
+def invalidate_mailbox_counters():
+    """
+    Marks the cached counters stale so the next scheduler tick refreshes them from Gmail.
+    Used when a sync could not produce deltas (e.g. a windowed resync).
+    """
+    counters = get_system_value(COUNTERS_KEY)
+    if counters:
+        counters["refreshed_at"] = None
+        save_system_value(COUNTERS_KEY, counters)
+
+
+def refresh_mailbox_counters_if_stale(gmail, max_age_seconds: int = COUNTERS_MAX_AGE_SECONDS) -> dict:
+    """
+    Refreshes the cached counters from Gmail only when they are missing, invalidated
+    or older than `max_age_seconds`; otherwise returns the cached values.
+    """
+    counters = get_system_value(COUNTERS_KEY)
+    refreshed_at = counters.get("refreshed_at") if counters else None
+    if refreshed_at:
+        age = (datetime.utcnow() - datetime.fromisoformat(refreshed_at)).total_seconds()
+        if age < max_age_seconds:
+            return counters
+    return refresh_mailbox_counters(gmail)
+
+
+def get_unread_count() -> dict:
+    """
+    Returns the cached unread count and how old it is.
+
+    Returns:
+        dict: {"unread": int or None, "updated_at": str or None, "age_seconds": int or None}
+    """
+    counters = get_system_value(COUNTERS_KEY)
+    if not counters:
+        return {"unread": None, "updated_at": None, "age_seconds": None}
+
+    updated_at = counters.get("updated_at")
+    age = int((datetime.utcnow() - datetime.fromisoformat(updated_at)).total_seconds()) if updated_at else None
+    return {
+        "unread": counters["labels"].get("UNREAD", {}).get("messagesTotal"),
+        "updated_at": updated_at,
+        "age_seconds": age,
+    }
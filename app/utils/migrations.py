@@ -0,0 +1,306 @@
+# Standard library imports
+import logging
+import sqlite3
+
+# Dimensions tracked in email_counters; NULL values are stored as ''
+COUNTER_DIMENSIONS = ("category", "predicted_by")
+
+
+def _counter_upsert(dimension_sql: str, value_sql: str, delta: str) -> str:
+    return f"""
+        INSERT INTO email_counters (dimension, value, count) VALUES ({dimension_sql}, {value_sql}, {delta})
+        ON CONFLICT(dimension, value) DO UPDATE SET count = count + ({delta});
+    """
+
+
+def _create_counter_triggers(conn: sqlite3.Connection):
+    """
+    Keeps email_counters in step with every insert, delete and reclassification of emails.
+    """
+    def changes(row: str, delta: str) -> str:
+        return _counter_upsert("'total'", "''", delta) + "".join(
+            _counter_upsert(f"'{dimension}'", f"IFNULL({row}.{dimension}, '')", delta)
+            for dimension in COUNTER_DIMENSIONS
+        )
+
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_email_counters_insert AFTER INSERT ON emails
+        BEGIN {changes("NEW", "1")} END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_email_counters_delete AFTER DELETE ON emails
+        BEGIN {changes("OLD", "-1")} END
+    """)
+    # The total is unchanged by an update, so only the per-dimension rows move
+    moves = "".join(
+        _counter_upsert(f"'{dimension}'", f"IFNULL(OLD.{dimension}, '')", "-1")
+        + _counter_upsert(f"'{dimension}'", f"IFNULL(NEW.{dimension}, '')", "1")
+        for dimension in COUNTER_DIMENSIONS
+    )
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_email_counters_update
+        AFTER UPDATE OF {", ".join(COUNTER_DIMENSIONS)} ON emails
+        WHEN {" OR ".join(f"OLD.{d} IS NOT NEW.{d}" for d in COUNTER_DIMENSIONS)}
+        BEGIN {moves} END
+    """)
+    rebuild_email_counters(conn)
+
+
+def rebuild_email_counters(conn: sqlite3.Connection):
+    """
+    Recomputes email_counters from the emails table (one full scan), e.g. after suspected drift.
+    """
+    conn.execute("DELETE FROM email_counters")
+    conn.execute("INSERT INTO email_counters (dimension, value, count) SELECT 'total', '', COUNT(*) FROM emails")
+    for dimension in COUNTER_DIMENSIONS:
+        conn.execute(f"""
+            INSERT INTO email_counters (dimension, value, count)
+            SELECT '{dimension}', IFNULL({dimension}, ''), COUNT(*) FROM emails GROUP BY 1, 2
+        """)
+
+
+# Columns of emails mirrored into the external-content FTS5 index
+SEARCH_COLUMNS = ("subject", "body", "sender", "sender_email")
+
+
+def _create_search_index(conn: sqlite3.Connection):
+    """
+    Creates the emails_fts index over emails (external content, so text is not stored
+    twice), keeps it in sync with triggers and indexes the existing rows.
+    """
+    columns = ", ".join(SEARCH_COLUMNS)
+    new_values = ", ".join(f"NEW.{column}" for column in SEARCH_COLUMNS)
+    old_values = ", ".join(f"OLD.{column}" for column in SEARCH_COLUMNS)
+
+    conn.execute(f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS emails_fts USING fts5(
+            {columns},
+            content='emails', content_rowid='rowid',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_emails_fts_insert AFTER INSERT ON emails BEGIN
+            INSERT INTO emails_fts (rowid, {columns}) VALUES (NEW.rowid, {new_values});
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_emails_fts_delete AFTER DELETE ON emails BEGIN
+            INSERT INTO emails_fts (emails_fts, rowid, {columns}) VALUES ('delete', OLD.rowid, {old_values});
+        END
+    """)
+    # Re-ingesting unchanged mail rewrites these columns; skip the index churn when nothing differs
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_emails_fts_update AFTER UPDATE OF {columns} ON emails
+        WHEN {" OR ".join(f"OLD.{column} IS NOT NEW.{column}" for column in SEARCH_COLUMNS)}
+        BEGIN
+            INSERT INTO emails_fts (emails_fts, rowid, {columns}) VALUES ('delete', OLD.rowid, {old_values});
+            INSERT INTO emails_fts (rowid, {columns}) VALUES (NEW.rowid, {new_values});
+        END
+    """)
+    rebuild_search_index(conn)
+
+
+def rebuild_search_index(conn: sqlite3.Connection):
+    """
+    Re-indexes every email. Needed after VACUUM, which may renumber the implicit rowids
+    of `emails` that the index points at.
+    """
+    conn.execute("INSERT INTO emails_fts (emails_fts) VALUES ('rebuild')")
+
+
+def _normalize_sender_label_counts(conn: sqlite3.Connection):
+    """
+    Moves the JSON classification_counts of sender_reputation into sender_label_counts rows.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS sender_label_counts (
+            sender_email TEXT NOT NULL,
+            label TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (sender_email, label)
+        ) WITHOUT ROWID
+    """)
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(sender_reputation)")}
+    if "classification_counts" in columns:
+        conn.execute("""
+            INSERT INTO sender_label_counts (sender_email, label, count)
+            SELECT r.sender_email, j.key, CAST(j.value AS INTEGER)
+            FROM sender_reputation r, json_each(COALESCE(NULLIF(r.classification_counts, ''), '{}')) j
+            WHERE true
+            ON CONFLICT(sender_email, label) DO UPDATE SET count = count + excluded.count
+        """)
+        conn.execute("ALTER TABLE sender_reputation DROP COLUMN classification_counts")
+
+
+def _add_backfill_failed_ids(conn: sqlite3.Connection):
+    """
+    Adds the JSON list of message ids a backfill window could not fetch yet.
+    """
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(backfill_windows)")}
+    if "failed_ids" not in columns:
+        conn.execute("ALTER TABLE backfill_windows ADD COLUMN failed_ids TEXT DEFAULT NULL")
+
+
+# Schema changes applied on top of the base tables created by initialize_database.
+# Each entry runs once, in order, inside its own transaction; the database records
+# the last applied version in PRAGMA user_version. Append new versions, never edit old ones.
+MIGRATIONS = [
+    (1, "Indexes for the hot email queries", [
+        # /list and the yearly cleanup: newest first / range on received_at
+        "CREATE INDEX IF NOT EXISTS idx_emails_received_at ON emails (received_at)",
+        # Unclassified scans, /stats counts and /manual-review tabs; covers COUNT(*) by category
+        "CREATE INDEX IF NOT EXISTS idx_emails_category_received ON emails (category, received_at)",
+        # Per-sender reputation recalculation
+        "CREATE INDEX IF NOT EXISTS idx_emails_sender_category ON emails (sender_email, category)",
+        # Training data selection by label source
+        "CREATE INDEX IF NOT EXISTS idx_emails_predicted_by_category ON emails (predicted_by, category)",
+        # Daily check for manual overrides that should trigger retraining
+        "CREATE INDEX IF NOT EXISTS idx_emails_override ON emails (manual_override, override_timestamp)",
+        # Backfill progress lookups
+        "CREATE INDEX IF NOT EXISTS idx_backfill_windows_job ON backfill_windows (job_id, window_end)",
+    ]),
+    (2, "Trigger-maintained email counters for dashboard stats", [
+        """
+        CREATE TABLE IF NOT EXISTS email_counters (
+            dimension TEXT NOT NULL,
+            value TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (dimension, value)
+        ) WITHOUT ROWID
+        """,
+        _create_counter_triggers,
+    ]),
+    (3, "FTS5 full-text index over stored emails", [
+        _create_search_index,
+    ]),
+    (4, "Keyset pagination indexes on (received_at, id)", [
+        # Each filter's index ends in (received_at, id) so filtered pages seek and stream in order
+        "CREATE INDEX IF NOT EXISTS idx_emails_received_id ON emails (received_at, id)",
+        "CREATE INDEX IF NOT EXISTS idx_emails_category_received_id ON emails (category, received_at, id)",
+        "CREATE INDEX IF NOT EXISTS idx_emails_sender_received_id ON emails (sender_email, received_at, id)",
+        "CREATE INDEX IF NOT EXISTS idx_emails_predicted_by_received_id ON emails (predicted_by, received_at, id)",
+        # Superseded by the indexes above (same leading columns)
+        "DROP INDEX IF EXISTS idx_emails_received_at",
+        "DROP INDEX IF EXISTS idx_emails_category_received",
+        "DROP INDEX IF EXISTS idx_emails_sender_category",
+        "DROP INDEX IF EXISTS idx_emails_predicted_by_category",
+    ]),
+    (5, "Normalized per-sender label counts replacing the JSON blob", [
+        _normalize_sender_label_counts,
+    ]),
+    (6, "Backfill windows remember messages that failed to fetch", [
+        _add_backfill_failed_ids,
+    ]),
+]
+
+# Hot queries whose plans must use an index; parameters only need the right shape.
+# The email list pages are added by _listing_hot_queries from the code that runs them.
+HOT_QUERIES = {
+    "count_unclassified": (
+        "SELECT COUNT(*) FROM emails WHERE category IS NULL OR category = 'Uncategorized'", ()
+    ),
+    "count_by_category": (
+        "SELECT category, COUNT(*) FROM emails GROUP BY category", ()
+    ),
+    "unread_today": (
+        "SELECT COUNT(*) FROM emails WHERE category = 'Uncategorized' AND received_at >= ?", ("2000-01-01",)
+    ),
+    "sender_classifications": (
+        "SELECT sender, category FROM emails WHERE sender_email = ? AND category IS NOT NULL", ("a@b.c",)
+    ),
+    "training_data": (
+        "SELECT sender, category FROM emails WHERE predicted_by = ? AND category IS NOT NULL", ("manual",)
+    ),
+    "manual_overrides": (
+        "SELECT id FROM emails WHERE manual_override = 1 AND override_timestamp BETWEEN ? AND ?",
+        ("2000-01-01", "2000-01-02")
+    ),
+    "cleanup_old": (
+        "SELECT id FROM emails WHERE received_at < ?", ("2000-01-01",)
+    ),
+}
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """
+    Returns the last migration version applied to the database.
+    """
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def apply_migrations(conn: sqlite3.Connection) -> int:
+    """
+    Applies every pending migration in order and returns the resulting schema version.
+    A failing migration is rolled back and leaves the version at the last good step.
+    """
+    version = get_schema_version(conn)
+    for target, description, statements in MIGRATIONS:
+        if target <= version:
+            continue
+        logging.info(f"🧱 Applying schema migration {target}: {description}")
+        try:
+            conn.execute("BEGIN")
+            for statement in statements:
+                if callable(statement):
+                    statement(conn)
+                else:
+                    conn.execute(statement)
+            conn.execute(f"PRAGMA user_version = {target}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            logging.error(f"❌ Schema migration {target} failed; staying at version {version}")
+            raise
+        version = target
+
+    # Refresh planner statistics only where they are missing or stale
+    conn.execute("PRAGMA optimize")
+    return version
+
+
+def _listing_hot_queries() -> dict:
+    """
+    Returns the keyset page queries app.utils.listing runs, built by its own query
+    builder. Imported here because listing imports the database module, which imports this one.
+    """
+    from app.utils.listing import MANUAL_REVIEW_COLUMNS, build_email_page_query, encode_cursor
+
+    cursor = encode_cursor("2000-01-01", "x")
+    shapes = {
+        "list_recent": {},
+        "list_page_after_cursor": {"cursor": cursor},
+        "list_page_by_category": {"cursor": cursor, "category": "Work"},
+        "list_page_by_sender": {"cursor": cursor, "sender": "a@b.c"},
+        "manual_review": {"category": "Suspected Spam", "columns": MANUAL_REVIEW_COLUMNS},
+    }
+    return {name: build_email_page_query(**shape) for name, shape in shapes.items()}
+
+
+def explain_hot_queries(conn: sqlite3.Connection) -> list:
+    """
+    Runs EXPLAIN QUERY PLAN for each hot query and reports whether it avoids a
+    full scan of `emails` and a temporary sort.
+
+    Returns:
+        list: [{"query": str, "plan": [str], "uses_index": bool}]
+    """
+    results = []
+    for name, (sql, params) in {**HOT_QUERIES, **_listing_hot_queries()}.items():
+        plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()]
+        full_scan = any(step.startswith("SCAN emails") and "INDEX" not in step for step in plan)
+        temp_sort = any("TEMP B-TREE" in step for step in plan)
+        results.append({"query": name, "plan": plan, "uses_index": not full_scan and not temp_sort})
+    return results
+
+
+def check_query_plans(conn: sqlite3.Connection) -> bool:
+    """
+    Logs a warning for every hot query that falls back to a table scan. Returns True if all use indexes.
+    """
+    ok = True
+    for result in explain_hot_queries(conn):
+        if not result["uses_index"]:
+            ok = False
+            logging.warning(f"⚠️ Query '{result['query']}' does not use an index: {' | '.join(result['plan'])}")
+    return ok
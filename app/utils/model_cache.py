@@ -0,0 +1,131 @@
+# Standard library imports
+import os
+import logging
+import threading
+import time
+from datetime import datetime
+
+# Third-party imports
+from joblib import load
+
+# Application-specific imports
+from app.utils.trainer import MODEL_PATH
+from app.utils.model_registry import resolve_current_model
+
+# How often the model file is stat()ed for changes; predictions in between are
+# served from memory without touching the filesystem.
+MODEL_RELOAD_CHECK_SECONDS = float(os.getenv("MODEL_RELOAD_CHECK_SECONDS", "1.0"))
+
+
+class ModelHolder:
+    """
+    Process-wide holder for the local classifier. The live registry version (or the
+    legacy MODEL_PATH before the first promotion) is deserialized once and reused
+    until the promoted version or the file's mtime/size/inode change, at which point
+    the new model is loaded off to the side and swapped in with a single assignment,
+    so concurrent predictions see either the old model or the new one, never a mix.
+    """
+    def __init__(self, path: str = MODEL_PATH, check_interval: float = MODEL_RELOAD_CHECK_SECONDS):
+        self.path = path
+        self.check_interval = check_interval
+        self.lock = threading.Lock()
+        self.current = (None, None, None)  # (model, signature, version), replaced together
+        self.checked_at = 0.0
+        self.stats = {
+            "hits": 0,
+            "loads": 0,
+            "load_failures": 0,
+            "last_load_seconds": None,
+            "total_load_seconds": 0.0,
+            "loaded_at": None,
+            "model_mtime": None,
+            "model_version": None,
+        }
+
+    def get(self):
+        """
+        Returns the current model, or None if no model file exists.
+        """
+        return self.get_versioned()[0]
+
+    def get_versioned(self) -> tuple:
+        """
+        Returns (model, version), or (None, None) if no model file exists.
+        """
+        model, _, version = self.current
+        if model is not None and time.monotonic() - self.checked_at < self.check_interval:
+            self.stats["hits"] += 1
+            return model, version
+
+        with self.lock:
+            model, signature, version = self.current
+            promoted = resolve_current_model()
+            latest_version, path = promoted if promoted else ("legacy", self.path)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                self.current = (None, None, None)
+                return None, None
+
+            self.checked_at = time.monotonic()
+            latest = (latest_version, stat.st_mtime_ns, stat.st_size, stat.st_ino)
+            if latest == signature:
+                self.stats["hits"] += 1
+                return model, version
+            return self._load(path, latest, fallback=(model, version))
+
+    def _load(self, path: str, signature: tuple, fallback: tuple) -> tuple:
+        # Caller holds the lock
+        started = time.perf_counter()
+        try:
+            model = load(path)
+        except Exception as e:
+            # Typically a file caught mid-write; keep serving the previous model and retry later
+            self.stats["load_failures"] += 1
+            logging.warning(f"⚠️ Failed to load local model from {path}: {e}")
+            return fallback
+
+        elapsed = time.perf_counter() - started
+        version = signature[0]
+        self.current = (model, signature, version)
+        self.stats["loads"] += 1
+        self.stats["last_load_seconds"] = round(elapsed, 4)
+        self.stats["total_load_seconds"] = round(self.stats["total_load_seconds"] + elapsed, 4)
+        self.stats["loaded_at"] = datetime.utcnow().isoformat()
+        self.stats["model_mtime"] = datetime.utcfromtimestamp(signature[1] / 1e9).isoformat()
+        self.stats["model_version"] = version
+        logging.info(f"🧠 Loaded local model {version} in {elapsed:.3f}s ({'reload' if fallback[0] is not None else 'first load'})")
+        return model, version
+
+    def invalidate(self):
+        """
+        Forces the next get() to re-check the model file.
+        """
+        self.checked_at = 0.0
+
+
+LOCAL_MODEL = ModelHolder()
+
+
+def get_local_model():
+    """
+    Returns the cached local classifier, reloading it if the file changed; None if missing.
+    """
+    return LOCAL_MODEL.get()
+
+
+def get_local_model_versioned() -> tuple:
+    """
+    Returns (model, version) of the cached local classifier; (None, None) if missing.
+    """
+    return LOCAL_MODEL.get_versioned()
+
+
+def get_model_cache_stats() -> dict:
+    """
+    Returns load timings and cache-hit counters of the local model holder.
+    """
+    stats = dict(LOCAL_MODEL.stats)
+    lookups = stats["hits"] + stats["loads"]
+    stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else None
+    return stats
@@ -0,0 +1,202 @@
+# Standard library imports
+import os
+import re
+import json
+import hashlib
+import logging
+import threading
+from datetime import datetime
+from pathlib import Path
+
+# Third-party imports
+from joblib import dump
+
+# Application-specific imports
+from app.utils.database import get_connection, save_system_value
+
+# Every trained model is stored as <version>.joblib plus <version>.json metadata,
+# where the version is a prefix of the artifact's sha256. Artifacts are never
+# modified after registration; `current.json` names the live one.
+MODEL_REGISTRY_DIR = os.getenv("MODEL_REGISTRY_DIR", "/data/models")
+POINTER_FILE = "current.json"
+POINTER_HISTORY = 20
+VERSION_LENGTH = 12
+VERSION_PATTERN = re.compile(rf"[0-9a-f]{{{VERSION_LENGTH}}}")
+
+# Serializes promotions so two pointer updates never interleave
+_pointer_lock = threading.Lock()
+
+
+def _registry_path(name: str) -> Path:
+    return Path(MODEL_REGISTRY_DIR) / name
+
+
+def _write_json_atomic(path: Path, data: dict):
+    """
+    Writes JSON next to `path` and renames it into place, so readers see the old
+    or the new file, never a partial one.
+    """
+    partial = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(partial, "w") as f:
+        json.dump(data, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(partial, path)
+
+
+def _read_json(path: Path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def register_model(model, metadata: dict) -> dict:
+    """
+    Stores a trained model as a content-addressed artifact with its metadata.
+    Registering identical bytes twice yields the same version.
+
+    Returns:
+        dict: The stored metadata, including "version" and "sha256".
+    """
+    directory = Path(MODEL_REGISTRY_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    incoming = _registry_path(f".incoming.{os.getpid()}.{threading.get_ident()}.joblib")
+    dump(model, incoming)
+
+    digest = hashlib.sha256()
+    with open(incoming, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    sha256 = digest.hexdigest()
+    version = sha256[:VERSION_LENGTH]
+
+    artifact = _registry_path(f"{version}.joblib")
+    if artifact.exists():
+        incoming.unlink()
+    else:
+        os.replace(incoming, artifact)
+
+    stored = {
+        **metadata,
+        "version": version,
+        "sha256": sha256,
+        "artifact": artifact.name,
+        "size_bytes": artifact.stat().st_size,
+        "registered_at": datetime.utcnow().isoformat(),
+    }
+    _write_json_atomic(_registry_path(f"{version}.json"), stored)
+    logging.info(f"📦 Registered model {version} ({stored['size_bytes']} bytes)")
+    return stored
+
+
+def get_model_metadata(version: str):
+    """
+    Returns a registered version's metadata, or None if unknown.
+    """
+    if not VERSION_PATTERN.fullmatch(version or ""):
+        return None
+    return _read_json(_registry_path(f"{version}.json"))
+
+
+def get_current_pointer():
+    """
+    Returns {"version", "promoted_at", "history"} for the live model, or None before the first promotion.
+    """
+    return _read_json(_registry_path(POINTER_FILE))
+
+
+def resolve_current_model():
+    """
+    Returns (version, artifact path) of the live model, or None before the first promotion.
+    """
+    pointer = get_current_pointer()
+    if not pointer:
+        return None
+    return pointer["version"], str(_registry_path(f"{pointer['version']}.joblib"))
+
+
+def _swap_pointer(version: str, history: list) -> dict:
+    # Caller holds _pointer_lock
+    metadata = get_model_metadata(version)
+    if metadata is None or not _registry_path(f"{version}.joblib").exists():
+        raise FileNotFoundError(f"Model version not found: {version}")
+    pointer = {
+        "version": version,
+        "promoted_at": datetime.utcnow().isoformat(),
+        "history": history[:POINTER_HISTORY],
+    }
+    _write_json_atomic(_registry_path(POINTER_FILE), pointer)
+    save_system_value("local_model", {**metadata, "promoted_at": pointer["promoted_at"]})
+    return pointer
+
+
+def promote_model(version: str) -> dict:
+    """
+    Makes `version` the live model. The previous version is remembered for rollback.
+    """
+    with _pointer_lock:
+        current = get_current_pointer() or {"version": None, "history": []}
+        history = current["history"]
+        if current["version"] and current["version"] != version:
+            history = [current["version"]] + history
+        pointer = _swap_pointer(version, history)
+    logging.info(f"🚀 Promoted model {version} (previous: {current['version']})")
+    return pointer
+
+
+def rollback_model(version: str = None) -> dict:
+    """
+    Switches back to the previously live model, or to an earlier `version` from the
+    promotion history. Versions newer than the target are dropped from the history.
+    """
+    with _pointer_lock:
+        current = get_current_pointer()
+        if not current or not current["history"]:
+            raise ValueError("No previous model version to roll back to")
+        history = current["history"]
+        target = version or history[0]
+        if target not in history:
+            raise ValueError(f"{target} was never live before {current['version']}")
+        pointer = _swap_pointer(target, history[history.index(target) + 1:])
+    logging.info(f"⏪ Rolled back model {current['version']} → {target}")
+    return pointer
+
+
+def list_models() -> list:
+    """
+    Returns every registered version, newest first, with its training metadata and
+    how its predictions have held up: how many emails it labeled and how many of
+    those the user later corrected by hand.
+    """
+    directory = Path(MODEL_REGISTRY_DIR)
+    if not directory.exists():
+        return []
+
+    pointer = get_current_pointer() or {"version": None, "history": []}
+    with get_connection() as conn:
+        usage = {
+            version: (predictions, overrides or 0)
+            for version, predictions, overrides in conn.execute("""
+                SELECT model_version, COUNT(*), SUM(manual_override)
+                FROM emails
+                WHERE model_version IS NOT NULL
+                GROUP BY model_version
+            """)
+        }
+
+    models = []
+    for path in directory.glob("*.json"):
+        if path.name == POINTER_FILE:
+            continue
+        metadata = _read_json(path)
+        if not metadata:
+            continue
+        predictions, overrides = usage.get(metadata["version"], (0, 0))
+        metadata["current"] = metadata["version"] == pointer["version"]
+        metadata["predictions"] = predictions
+        metadata["manual_overrides"] = overrides
+        metadata["override_rate"] = round(overrides / predictions, 4) if predictions else None
+        models.append(metadata)
+    return sorted(models, key=lambda model: model["registered_at"], reverse=True)
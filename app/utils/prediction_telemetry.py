@@ -0,0 +1,181 @@
+# Standard library imports
+import os
+import logging
+import threading
+from datetime import datetime
+
+# Third-party imports
+import numpy as np
+
+# Application-specific imports
+from app.utils.database import get_system_value, save_system_value
+
+# Aggregates are kept in memory and merged into the system table at this interval
+TELEMETRY_FLUSH_SECONDS = float(os.getenv("TELEMETRY_FLUSH_SECONDS", "30"))
+
+LAST_PREDICTION_KEY = "local_model_last_prediction"
+TELEMETRY_KEY = "local_model_telemetry"
+
+# Confidence histogram buckets: 0-9, 10-19, ..., 90-100
+CONFIDENCE_BUCKETS = [f"{low}-{low + 9 if low < 90 else 100}" for low in range(0, 100, 10)]
+
+
+class PredictionTelemetry:
+    """
+    Collects local-model prediction counts, label distribution, a confidence
+    histogram and per-model-version latency in memory. Recording is a few array
+    ops with no I/O; the pending deltas are merged into the lifetime totals in
+    the system table by a timer and at shutdown.
+    """
+    def __init__(self, flush_interval: float = TELEMETRY_FLUSH_SECONDS):
+        self.flush_interval = flush_interval
+        # `lock` guards the in-memory counters and is never held across I/O;
+        # `flush_lock` serializes read-merge-write cycles of the stored totals.
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.timer = None
+        self._clear()
+
+    def _clear(self):
+        self.predictions = 0
+        self.batches = 0
+        self.labels = {}
+        self.histogram = np.zeros(len(CONFIDENCE_BUCKETS), dtype=np.int64)
+        self.versions = {}
+        self.last_prediction = None
+
+    def _pending(self) -> dict:
+        # Caller holds the lock
+        return {
+            "predictions": self.predictions,
+            "batches": self.batches,
+            "labels": dict(self.labels),
+            "histogram": self.histogram.copy(),
+            "versions": {name: dict(values) for name, values in self.versions.items()},
+            "last_prediction": self.last_prediction,
+        }
+
+    def _restore(self, pending: dict):
+        # Caller holds the lock; adds counts taken by a failed flush back in
+        self.predictions += pending["predictions"]
+        self.batches += pending["batches"]
+        for name, count in pending["labels"].items():
+            self.labels[name] = self.labels.get(name, 0) + count
+        self.histogram += pending["histogram"]
+        for name, values in pending["versions"].items():
+            version = self.versions.setdefault(name, {"predictions": 0, "batches": 0, "seconds": 0.0})
+            for field in ("predictions", "batches", "seconds"):
+                version[field] += values[field]
+        self.last_prediction = self.last_prediction or pending["last_prediction"]
+
+    def record(self, labels, confidences, model_version: str = None, seconds: float = 0.0):
+        """
+        Adds one batch of predictions (label array, confidence percentage array) made
+        by `model_version` in `seconds`.
+        """
+        if len(labels) == 0:
+            return
+        names, counts = np.unique(labels, return_counts=True)
+        buckets = np.bincount(np.minimum(np.asarray(confidences) // 10, 9), minlength=len(CONFIDENCE_BUCKETS))
+        with self.lock:
+            self.predictions += len(labels)
+            self.batches += 1
+            for name, count in zip(names.tolist(), counts.tolist()):
+                self.labels[name] = self.labels.get(name, 0) + count
+            self.histogram += buckets
+            version = self.versions.setdefault(model_version or "unknown", {"predictions": 0, "batches": 0, "seconds": 0.0})
+            version["predictions"] += len(labels)
+            version["batches"] += 1
+            version["seconds"] += seconds
+            self.last_prediction = {
+                "timestamp": datetime.utcnow().isoformat(),
+                "label": str(labels[-1]),
+                "confidence": int(confidences[-1]),
+                "batch_size": len(labels),
+                "model_version": model_version
+            }
+            if self.timer is None:
+                self.timer = threading.Timer(self.flush_interval, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+
+    @staticmethod
+    def _merge(stored: dict, pending: dict) -> dict:
+        totals = dict(stored or {})
+        labels = dict(totals.get("labels", {}))
+        for name, count in pending["labels"].items():
+            labels[name] = labels.get(name, 0) + count
+        histogram = totals.get("confidence_histogram") or dict.fromkeys(CONFIDENCE_BUCKETS, 0)
+        histogram = {bucket: histogram.get(bucket, 0) + int(count) for bucket, count in zip(CONFIDENCE_BUCKETS, pending["histogram"])}
+        versions = {name: dict(values) for name, values in totals.get("by_version", {}).items()}
+        for name, values in pending["versions"].items():
+            merged = versions.setdefault(name, {"predictions": 0, "batches": 0, "seconds": 0.0})
+            for field in ("predictions", "batches", "seconds"):
+                merged[field] += values[field]
+            merged["seconds"] = round(merged["seconds"], 6)
+            merged["ms_per_prediction"] = round(merged["seconds"] * 1000 / merged["predictions"], 4)
+        totals.update({
+            "predictions": totals.get("predictions", 0) + pending["predictions"],
+            "batches": totals.get("batches", 0) + pending["batches"],
+            "labels": labels,
+            "confidence_histogram": histogram,
+            "by_version": versions,
+        })
+        if pending["last_prediction"]:
+            totals["last_prediction"] = pending["last_prediction"]["timestamp"]
+        return totals
+
+    def flush(self):
+        """
+        Merges pending counts into the stored totals and saves the last prediction.
+        The counters are swapped out under the lock; the database is only touched
+        after it is released, so record() never waits on disk.
+        """
+        with self.flush_lock:
+            with self.lock:
+                if self.timer is not None:
+                    self.timer.cancel()
+                    self.timer = None
+                if not self.predictions:
+                    return
+                pending = self._pending()
+                self._clear()
+
+            try:
+                save_system_value(TELEMETRY_KEY, self._merge(get_system_value(TELEMETRY_KEY), pending))
+                save_system_value(LAST_PREDICTION_KEY, pending["last_prediction"])
+            except Exception as e:
+                logging.error(f"❌ Failed to flush prediction telemetry: {e}")
+                with self.lock:
+                    self._restore(pending)
+                return
+            logging.debug(f"📈 Flushed telemetry for {pending['predictions']} predictions")
+
+    def snapshot(self) -> dict:
+        """
+        Returns the stored totals with not-yet-flushed predictions included.
+        """
+        with self.flush_lock:
+            stored = get_system_value(TELEMETRY_KEY)
+            with self.lock:
+                pending = self._pending()
+        totals = self._merge(stored, pending)
+        totals["pending"] = pending["predictions"]
+        return totals
+
+
+PREDICTION_TELEMETRY = PredictionTelemetry()
+
+
+def record_predictions(labels, confidences, model_version: str = None, seconds: float = 0.0):
+    """
+    Records a batch of local-model predictions; no disk I/O.
+    """
+    PREDICTION_TELEMETRY.record(labels, confidences, model_version, seconds)
+
+
+def get_prediction_telemetry() -> dict:
+    """
+    Returns lifetime prediction counts, label distribution, confidence histogram and per-version latency.
+    """
+    return PREDICTION_TELEMETRY.snapshot()
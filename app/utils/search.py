@@ -0,0 +1,71 @@
+# Standard library imports
+import re
+
+# Application-specific imports
+from app.utils.database import get_connection
+
+# bm25 column weights for (subject, body, sender, sender_email): a hit in the
+# subject or sender says more about an email than one buried in its body.
+SEARCH_WEIGHTS = (10.0, 1.0, 5.0, 5.0)
+MAX_PAGE_SIZE = 100
+
+TOKEN_PATTERN = re.compile(r"[\w@.+-]+", re.UNICODE)
+
+
+def build_match_query(text: str) -> str:
+    """
+    Turns free text into an FTS5 MATCH expression: every term must match, terms
+    are quoted so FTS5 operators in user input are treated literally, and the
+    last term matches as a prefix so results update while typing.
+    """
+    terms = [term.replace('"', '""') for term in TOKEN_PATTERN.findall(text or "")]
+    if not terms:
+        return ""
+    phrases = [f'"{term}"' for term in terms]
+    phrases[-1] += "*"
+    return " ".join(phrases)
+
+
+def search_emails(text: str, limit: int = 20, offset: int = 0) -> dict:
+    """
+    Full-text search over subject, body, sender and sender_email, best matches first.
+
+    Returns:
+        dict: {"query": str, "results": [dict], "offset": int, "limit": int, "has_more": bool}
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    offset = max(0, offset)
+    match = build_match_query(text)
+    if not match:
+        return {"query": "", "results": [], "offset": offset, "limit": limit, "has_more": False}
+
+    weights = ", ".join(str(weight) for weight in SEARCH_WEIGHTS)
+    with get_connection() as conn:
+        rows = conn.execute(f"""
+            SELECT e.id, e.sender, e.sender_email, e.subject, e.category, e.received_at,
+                   e.predicted_by, e.confidence,
+                   snippet(emails_fts, -1, '<mark>', '</mark>', '…', 12) AS snippet,
+                   bm25(emails_fts, {weights}) AS score
+            FROM emails_fts
+            JOIN emails e ON e.rowid = emails_fts.rowid
+            WHERE emails_fts MATCH ?
+            ORDER BY score
+            LIMIT ? OFFSET ?
+        """, (match, limit + 1, offset)).fetchall()
+
+    results = [
+        {
+            "id": row[0],
+            "sender": row[1],
+            "email": row[2],
+            "subject": row[3],
+            "category": row[4],
+            "received_at": row[5],
+            "predicted_by": row[6],
+            "confidence": row[7],
+            "snippet": row[8],
+            "score": round(-row[9], 3)  # bm25 is lower-is-better; expose higher-is-better
+        }
+        for row in rows[:limit]
+    ]
+    return {"query": match, "results": results, "offset": offset, "limit": limit, "has_more": len(rows) > limit}
@@ -1,36 +1,53 @@
 # Standard library imports
-import sqlite3
 import logging
-import json
+import time
 from datetime import datetime
 
 # Third-party imports
+import numpy as np
 from sklearn.pipeline import Pipeline
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.naive_bayes import MultinomialNB
-from sklearn.model_selection import train_test_split
+from sklearn.model_selection import GroupShuffleSplit
 from sklearn.metrics import classification_report, accuracy_score
-from joblib import dump
 
 # Application-specific imports
-from app.utils.database import get_db_path
+from app.utils.database import get_connection, save_system_value
+from app.utils.model_registry import register_model, promote_model
 
 # Constants
+# Pre-registry model location; still served until the first registered model is promoted
 MODEL_PATH = "/data/local_classifier.joblib"
 
-def fetch_training_data(source="manual"):
+# Per-sample weight of a label by where it came from: a user's correction counts
+# more than an OpenAI label, which counts more than the local model's own output.
+SOURCE_WEIGHTS = {
+    "manual": 2.0,
+    "openai": 1.0,
+    "local": 0.5,
+}
+
+# Labels trained on by default. The local model's own predictions are opt-in: training
+# on them feeds the model its own mistakes, and they are never used for evaluation.
+DEFAULT_TRAINING_SOURCES = ("openai", "manual")
+SELF_LABELED_SOURCE = "local"
+
+def fetch_training_data(sources=DEFAULT_TRAINING_SOURCES):
     """
-    Fetch sender, email, subject, and category from classified emails.
+    Fetch id, sender, email, subject, category and label source from classified emails.
+    Manually overridden emails count as "manual" whatever predicted them first.
     """
-    conn = sqlite3.connect(get_db_path())
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT sender, sender_email, subject, category FROM emails
-        WHERE predicted_by = ? AND category IS NOT NULL
-    """, (source,))
-    rows = cursor.fetchall()
-    conn.close()
-    return rows
+    sources = (sources,) if isinstance(sources, str) else tuple(sources)
+    with get_connection() as conn:
+        return conn.execute(f"""
+            SELECT id, sender, sender_email, subject, category, label_source FROM (
+                SELECT id, sender, sender_email, subject, category,
+                       CASE WHEN manual_override = 1 THEN 'manual' ELSE predicted_by END AS label_source
+                FROM emails
+                WHERE category IS NOT NULL AND category != 'Uncategorized'
+            )
+            WHERE label_source IN ({','.join('?' * len(sources))})
+        """, sources).fetchall()
 
 def combine_features(sender, email, subject):
     """
@@ -38,45 +55,61 @@ def combine_features(sender, email, subject):
     """
     return f"{sender} <{email}> - {subject}"
 
-def train_local_classifier(source="manual", manual_weight=2):
+def train_local_classifier(source=DEFAULT_TRAINING_SOURCES, source_weights=None, include_local: bool = False):
     """
     Train a local MultinomialNB model and evaluate on a hold-out test set.
-    Gives more weight to manual classifications by duplicating their samples.
+    Each email is one sample weighted by its label source (SOURCE_WEIGHTS, overridable
+    via `source_weights`); the split is grouped by email id so no email lands on both sides.
+    The local model's own labels are only added with `include_local`, and then only to
+    the training side, so accuracy is measured on OpenAI and manual labels alone.
+    The model is stored in the model registry with its metrics and promoted to live.
     Saves model metrics in the `system` table.
     """
-    logging.info(f"📚 Training local classifier on {source} labels...")
-    rows = fetch_training_data(source)
+    sources = [source] if isinstance(source, str) else list(source)
+    if include_local and SELF_LABELED_SOURCE not in sources:
+        sources.append(SELF_LABELED_SOURCE)
+    weights_by_source = {**SOURCE_WEIGHTS, **(source_weights or {})}
+    logging.info(f"📚 Training local classifier on {', '.join(sources)} labels...")
+    rows = fetch_training_data(sources)
 
     if not rows:
         logging.warning("⚠️ No training data available.")
         return False
 
-    texts = []
-    labels = []
-
-    for sender, email, subject, category in rows:
-        feature = combine_features(sender, email, subject)
-        texts.append(feature)
-        labels.append(category)
-        # Add additional weight for manual classifications
-        if source == "manual":
-            texts.extend([feature] * (manual_weight - 1))
-            labels.extend([category] * (manual_weight - 1))
-
-    # Split into train/test
-    X_train, X_test, y_train, y_test = train_test_split(texts, labels, test_size=0.1, random_state=42)
+    ids = np.array([row[0] for row in rows], dtype=object)
+    texts = np.array([combine_features(sender, email, subject) for _, sender, email, subject, _, _ in rows], dtype=object)
+    labels = np.array([row[4] for row in rows], dtype=object)
+    weights = np.array([weights_by_source.get(row[5], 1.0) for row in rows], dtype=float)
+    samples_by_source = {}
+    for row in rows:
+        samples_by_source[row[5]] = samples_by_source.get(row[5], 0) + 1
+
+    # Split the independently labeled emails into train/test, keeping every email on one
+    # side of the boundary; self-labeled emails only ever train
+    self_labeled = np.array([row[5] == SELF_LABELED_SOURCE for row in rows])
+    labeled_idx, self_labeled_idx = np.flatnonzero(~self_labeled), np.flatnonzero(self_labeled)
+    if not len(labeled_idx):
+        logging.warning("⚠️ No OpenAI or manual labels to evaluate against.")
+        return False
+    train_part, test_part = next(GroupShuffleSplit(n_splits=1, test_size=0.1, random_state=42).split(
+        texts[labeled_idx], labels[labeled_idx], groups=ids[labeled_idx]))
+    train_idx = np.concatenate([labeled_idx[train_part], self_labeled_idx])
+    test_idx = labeled_idx[test_part]
+    X_train, X_test, y_train, y_test = texts[train_idx], texts[test_idx], labels[train_idx], labels[test_idx]
 
     pipeline = Pipeline([
         ('tfidf', TfidfVectorizer(lowercase=True, stop_words='english')),
         ('clf', MultinomialNB())
     ])
 
-    pipeline.fit(X_train, y_train)
-    dump(pipeline, MODEL_PATH)
-    logging.info(f"✅ Model trained and saved to {MODEL_PATH} with {len(X_train)} training samples.")
+    started = time.perf_counter()
+    pipeline.fit(X_train, y_train, clf__sample_weight=weights[train_idx])
+    training_seconds = time.perf_counter() - started
 
     # Evaluate on test set
+    started = time.perf_counter()
     y_pred = pipeline.predict(X_test)
+    evaluation_seconds = time.perf_counter() - started
     acc = accuracy_score(y_test, y_pred)
     report = classification_report(y_test, y_pred, output_dict=True)
 
@@ -84,25 +117,32 @@ def train_local_classifier(source="manual", manual_weight=2):
     logging.info(f"Accuracy: {acc:.2%}")
     logging.info("\n" + classification_report(y_test, y_pred))
 
+    # Store the artifact with its metrics, then make it the live model in one pointer swap
+    model = register_model(pipeline, {
+        "source": sources,
+        "source_weights": weights_by_source,
+        "samples_by_source": samples_by_source,
+        "train_size": len(X_train),
+        "test_size": len(X_test),
+        "accuracy": acc,
+        "training_seconds": round(training_seconds, 3),
+        "evaluation_ms_per_email": round(evaluation_seconds * 1000 / max(len(X_test), 1), 4),
+        "trained_at": datetime.utcnow().isoformat()
+    })
+    promote_model(model["version"])
+    logging.info(f"✅ Model {model['version']} trained and promoted with {len(X_train)} training samples.")
+
     # Save metrics to the system table
-    from app.utils.database import ensure_system_table
-    ensure_system_table()
-
-    conn = sqlite3.connect(get_db_path())
-    cursor = conn.cursor()
-    cursor.execute("""
-        INSERT INTO system (key, value)
-        VALUES (?, ?)
-        ON CONFLICT(key) DO UPDATE SET value = excluded.value
-    """, ("local_model_evaluation", json.dumps({
-        "source": source,
+    save_system_value("local_model_evaluation", {
+        "source": sources,
+        "source_weights": weights_by_source,
+        "samples_by_source": samples_by_source,
+        "model_version": model["version"],
         "train_size": len(X_train),
         "test_size": len(X_test),
         "accuracy": acc,
         "report": report,
         "timestamp": datetime.utcnow().isoformat()
-    })))
-    conn.commit()
-    conn.close()
+    })
 
     return True
\ No newline at end of file
@@ -0,0 +1,294 @@
+# Standard library imports
+import os
+import queue
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+# Application-specific imports
+from app.utils.database import get_connection, apply_reputation_increments
+
+# A batch is committed once it holds this many intents or its oldest intent
+# has waited this long, whichever comes first.
+WRITE_BATCH_MAX = int(os.getenv("WRITE_BATCH_MAX", "500"))
+WRITE_FLUSH_INTERVAL_SECONDS = float(os.getenv("WRITE_FLUSH_INTERVAL_SECONDS", "0.25"))
+
+# A batch that fails to commit is kept and retried, topped up with newer intents
+# to at most WRITE_BATCH_MAX, after an exponential backoff capped at
+# WRITE_RETRY_MAX_DELAY_SECONDS. After WRITE_RETRY_ATTEMPTS failures it is split in
+# halves until the intents that still fail on their own are isolated; those are
+# dropped into a bounded dead-letter list so later writes are not held up.
+WRITE_RETRY_BASE_DELAY_SECONDS = 0.1
+WRITE_RETRY_MAX_DELAY_SECONDS = 5.0
+WRITE_RETRY_ATTEMPTS = 5
+WRITE_DEAD_LETTER_MAX = 1000
+
+
+def _write_classifications(cursor, intents):
+    # Last result per email wins
+    latest = {}
+    for email_id, category, predicted_by, confidence, model_version in intents:
+        latest[email_id] = (category, predicted_by, confidence, model_version, email_id)
+    cursor.executemany("""
+        UPDATE emails
+        SET category = ?, predicted_by = ?, confidence = ?, model_version = ?, override_timestamp = NULL
+        WHERE id = ?
+    """, list(latest.values()))
+
+
+def _write_manual_labels(cursor, intents):
+    latest = {}
+    for email_id, label, timestamp in intents:
+        latest[email_id] = (label, timestamp, email_id)
+    cursor.executemany("""
+        UPDATE emails
+        SET category = ?, manual_override = 1, override_timestamp = ?
+        WHERE id = ?
+    """, list(latest.values()))
+
+
+def _write_reputation(cursor, intents):
+    # Increments are summed per (sender, label), then applied as one batch of UPSERTs
+    senders = {}
+    for sender_email, sender_name, label, count in intents:
+        name, labels = senders.get(sender_email, (None, {}))
+        labels[label] = labels.get(label, 0) + count
+        senders[sender_email] = (sender_name or name, labels)
+    apply_reputation_increments(cursor, senders)
+
+
+WRITERS = {
+    "classification": _write_classifications,
+    "manual_label": _write_manual_labels,
+    "reputation": _write_reputation,
+}
+
+
+class WriteBehindQueue:
+    """
+    Funnels write intents from any thread into one writer thread that commits them
+    in coalesced batches, so callers never wait on SQLite locks or fsyncs and the
+    database only ever sees a single writer for these updates.
+    """
+    def __init__(self, batch_max: int = WRITE_BATCH_MAX, flush_interval: float = WRITE_FLUSH_INTERVAL_SECONDS):
+        self.batch_max = batch_max
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.thread = None
+        self.paused = False
+        self.stopped_clean = True
+        self.last_error = None
+        self.dead_letters = deque(maxlen=WRITE_DEAD_LETTER_MAX)
+        self.stats = {"enqueued": 0, "written": 0, "batches": 0, "failed": 0, "retrying": 0,
+                      "dead_lettered": 0, "last_batch": 0}
+
+    def enqueue(self, kind: str, intent: tuple):
+        """
+        Queues one write intent; returns immediately.
+        """
+        if kind not in WRITERS:
+            raise ValueError(f"Unknown write intent: {kind}")
+        self._ensure_started()
+        self.stats["enqueued"] += 1
+        self.queue.put((kind, intent))
+
+    def flush(self, timeout: float = None) -> bool:
+        """
+        Blocks until everything queued before this call is committed. Returns False on timeout.
+        """
+        if self.thread is None and not self.paused:
+            return True
+        done = threading.Event()
+        self.queue.put(("flush", done))
+        return done.wait(timeout)
+
+    def stop(self, timeout: float = 10.0) -> bool:
+        """
+        Flushes pending intents and stops the writer thread. Returns False if the writer
+        did not exit in time or could not commit everything; uncommitted intents stay queued.
+        """
+        with self.lock:
+            thread, self.thread = self.thread, None
+        if thread is None:
+            return True
+        self.queue.put(("stop", None))
+        thread.join(timeout)
+        logging.info(f"🖊️ Write-behind queue stopped: {self.stats}")
+        return not thread.is_alive() and self.stopped_clean
+
+    def pause(self, timeout: float = 30.0) -> bool:
+        """
+        Commits everything queued so far and stops the writer, e.g. while the database
+        file is replaced. Intents queued while paused wait for resume(). Returns False,
+        leaving the queue running, if it could not be drained within `timeout`.
+        """
+        with self.lock:
+            self.paused = True
+        if self.thread is None or (self.flush(timeout) and self.stop(timeout)):
+            return True
+        self.resume()
+        return False
+
+    def resume(self):
+        """
+        Restarts the writer after pause(), committing whatever was queued meanwhile.
+        """
+        with self.lock:
+            self.paused = False
+        if not self.queue.empty():
+            self._ensure_started()
+
+    def _ensure_started(self):
+        if self.thread is not None or self.paused:
+            return
+        with self.lock:
+            if self.thread is None and not self.paused:
+                self.thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+                self.thread.start()
+
+    def _run(self):
+        # `pending` holds a batch that failed to commit; it is retried ahead of newer
+        # intents, and flush waiters are released once it is written or dead-lettered.
+        pending, waiters, failures = [], [], 0
+        while True:
+            if pending:
+                time.sleep(min(WRITE_RETRY_MAX_DELAY_SECONDS, WRITE_RETRY_BASE_DELAY_SECONDS * 2 ** (failures - 1)))
+                try:
+                    kind, intent = self.queue.get_nowait() if len(pending) < self.batch_max else (None, None)
+                except queue.Empty:
+                    kind = None
+            else:
+                kind, intent = self.queue.get()
+            batch, stopping = pending, False
+            deadline = time.monotonic() + self.flush_interval
+
+            # Gather until the batch is full, the interval is up, or a flush/stop arrives
+            while kind is not None:
+                if kind == "flush":
+                    waiters.append(intent)
+                    break
+                if kind == "stop":
+                    stopping = True
+                    break
+                batch.append((kind, intent))
+                if len(batch) >= self.batch_max:
+                    break
+                try:
+                    kind, intent = self.queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+
+            if batch:
+                if self._commit(batch):
+                    pending, failures = [], 0
+                else:
+                    failures += 1
+                    pending = batch
+                    if failures >= WRITE_RETRY_ATTEMPTS:
+                        self._isolate_failures(batch)
+                        pending, failures = [], 0
+                self.stats["retrying"] = len(pending)
+            if stopping:
+                # Drain whatever raced in behind the stop marker and make a last attempt
+                while not self.queue.empty():
+                    kind, intent = self.queue.get_nowait()
+                    if kind in WRITERS:
+                        pending.append((kind, intent))
+                    elif kind == "flush":
+                        waiters.append(intent)
+                self.stopped_clean = not pending or self._commit(pending)
+                if not self.stopped_clean:
+                    # Kept for the next writer (after resume()); lost if the process is exiting
+                    logging.error(f"❌ {len(pending)} queued writes could not be committed before the writer stopped")
+                    for item in pending:
+                        self.queue.put(item)
+                for waiter in waiters:
+                    waiter.set()
+                return
+            if not pending:
+                for waiter in waiters:
+                    waiter.set()
+                waiters = []
+
+    def _isolate_failures(self, batch: list):
+        """
+        Commits what can be committed of a batch that keeps failing by splitting it in
+        halves (order preserved); intents that fail on their own are dead-lettered.
+        """
+        if self._commit(batch, log=False):
+            return
+        if len(batch) == 1:
+            kind, intent = batch[0]
+            self.dead_letters.append({
+                "kind": kind,
+                "intent": intent,
+                "error": str(self.last_error),
+                "failed_at": datetime.utcnow().isoformat()
+            })
+            self.stats["dead_lettered"] += 1
+            logging.error(f"☠️ Dropped {kind} write {intent} after {WRITE_RETRY_ATTEMPTS} failed attempts: {self.last_error}")
+            return
+        middle = len(batch) // 2
+        self._isolate_failures(batch[:middle])
+        self._isolate_failures(batch[middle:])
+
+    def _commit(self, batch: list, log: bool = True) -> bool:
+        """
+        Writes a batch in one transaction. Consecutive intents of the same kind are
+        coalesced; order between kinds is preserved. Returns False if it was rolled back.
+        """
+        started = time.perf_counter()
+        runs = []
+        for kind, intent in batch:
+            if runs and runs[-1][0] == kind:
+                runs[-1][1].append(intent)
+            else:
+                runs.append((kind, [intent]))
+
+        try:
+            with get_connection() as conn:
+                cursor = conn.cursor()
+                for kind, intents in runs:
+                    WRITERS[kind](cursor, intents)
+        except Exception as e:
+            self.last_error = e
+            self.stats["failed"] += len(batch)
+            if log:
+                logging.error(f"❌ Write-behind batch of {len(batch)} intents failed at {datetime.utcnow().isoformat()}: {e}")
+            return False
+
+        self.stats["written"] += len(batch)
+        self.stats["batches"] += 1
+        self.stats["last_batch"] = len(batch)
+        logging.debug(f"🖊️ Committed {len(batch)} queued writes in {time.perf_counter() - started:.3f}s")
+        return True
+
+
+# Shared by every module so all queued writes go through one connection
+WRITE_QUEUE = WriteBehindQueue()
+
+
+def queue_classifications(updates):
+    """
+    Queues (email_id, category, predicted_by, confidence[, model_version]) results for
+    the writer thread. Results without a model version (OpenAI, Spamhaus) clear it.
+    """
+    for update in updates:
+        WRITE_QUEUE.enqueue("classification", (*update, None)[:5])
+
+
+def queue_manual_label(email_id: str, label: str):
+    """
+    Queues a user-chosen label, stamped with the time it was chosen.
+    """
+    WRITE_QUEUE.enqueue("manual_label", (email_id, label, datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")))
+
+
+def queue_reputation_update(sender_email: str, sender_name: str, label: str, count: int = 1):
+    """
+    Queues `count` more `label` classifications for a sender's reputation.
+    """
+    WRITE_QUEUE.enqueue("reputation", (sender_email, sender_name, label, count))
@@ -0,0 +1,62 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.routers.gmail import search as search_router
+from app.utils import database
+from app.utils.search import MAX_PAGE_SIZE
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DB_PATH", str(tmp_path / "gmail.sqlite"))
+    database.initialize_database()
+    database.bulk_upsert_emails([
+        {
+            "id": f"msg-{i:04d}",
+            "sender": "Billing",
+            "email": "billing@example.com",
+            "subject": f"Invoice {i}",
+            "body": "Your invoice is attached.",
+            "received_at": f"2026-01-01T00:{i // 60:02d}:{i % 60:02d}",
+        }
+        for i in range(MAX_PAGE_SIZE + 50)
+    ])
+
+    app = FastAPI()
+    app.include_router(search_router.router)
+    yield TestClient(app)
+    database.close_all_connections()
+
+
+def result_ids(response):
+    assert response.status_code == 200
+    return [result["id"] for result in response.json()["results"]]
+
+
+def test_oversized_page_size_is_clamped_before_the_offset(client):
+    first = client.get("/search", params={"q": "invoice", "page": 1, "page_size": 500})
+    second = client.get("/search", params={"q": "invoice", "page": 2, "page_size": 500})
+
+    assert first.json()["page_size"] == MAX_PAGE_SIZE
+    assert first.json()["has_more"] is True
+    first_ids, second_ids = result_ids(first), result_ids(second)
+    assert len(first_ids) == MAX_PAGE_SIZE
+    # Page 2 continues right after page 1 instead of skipping to offset 500
+    assert len(second_ids) == 50
+    assert not set(first_ids) & set(second_ids)
+    assert second.json()["has_more"] is False
+
+
+def test_pages_cover_every_match_exactly_once(client):
+    seen = []
+    page = 1
+    while True:
+        response = client.get("/search", params={"q": "invoice", "page": page, "page_size": 40})
+        seen += result_ids(response)
+        if not response.json()["has_more"]:
+            break
+        page += 1
+
+    assert len(seen) == MAX_PAGE_SIZE + 50
+    assert len(set(seen)) == len(seen)
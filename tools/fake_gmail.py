@@ -0,0 +1,423 @@
+"""
+Offline stand-in for the Gmail REST API, serving a synthetic mailbox.
+
+Implements the subset GmailService uses: users.getProfile, messages.list/get
+(including `format`, `metadataHeaders` and `fields` partial responses),
+history.list, labels.get and the multipart/mixed batch endpoint. Latency and
+429 rate-limit responses can be injected to exercise the retry path.
+
+Run standalone:
+    python tools/fake_gmail.py --messages 20000 --port 8765
+    GMAIL_API_ROOT=http://127.0.0.1:8765 uvicorn app.main:app
+"""
+# Standard library imports
+import argparse
+import base64
+import json
+import random
+import re
+import socket
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+FIRST_NAMES = ["Ava", "Liam", "Maya", "Noah", "Zoe", "Ethan", "Iris", "Omar", "Lena", "Kai"]
+LAST_NAMES = ["Park", "Nguyen", "Garcia", "Smith", "Kowalski", "Haddad", "Okafor", "Silva"]
+DOMAINS = ["example.com", "mail.example.org", "shop.example.net", "news.example.io", "corp.example.co"]
+SUBJECTS = [
+    "Your order #{n} has shipped",
+    "Weekly digest: {n} new posts",
+    "Invoice {n} is ready",
+    "Meeting notes from standup {n}",
+    "Security alert: new sign-in ({n})",
+    "Re: project update {n}",
+    "Your receipt from Example Store #{n}",
+    "{n} people viewed your profile",
+]
+WORDS = ("lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor "
+         "incididunt ut labore et dolore magna aliqua").split()
+
+RATE_LIMIT_ERROR = {
+    "error": {
+        "code": 429,
+        "message": "Too many concurrent requests for user.",
+        "errors": [{"reason": "rateLimitExceeded", "message": "Too many concurrent requests for user."}],
+        "status": "RESOURCE_EXHAUSTED",
+    }
+}
+
+
+class SyntheticMailbox:
+    """
+    Deterministic generated mailbox. Message resources are rendered on demand from the
+    message index, so large mailboxes cost a few bytes of state per message.
+    """
+    def __init__(self, size: int = 1000, days: int = 180, seed: int = 42, unread_ratio: float = 0.3):
+        self.seed = seed
+        self.unread_ratio = unread_ratio
+        self.lock = threading.Lock()
+        self.end = datetime.now(timezone.utc)
+        self.span_ms = days * 86400 * 1000
+        self.messages = []  # (id, internal_date_ms, label_ids), newest first
+        self.history = []   # (history_id, record)
+        self.history_id = 1000
+        self.oldest_history_id = self.history_id
+        for index in range(size):
+            internal_date = int(self.end.timestamp() * 1000) - int(self.span_ms * index / max(size, 1))
+            self.messages.append(self._new_message(index, internal_date))
+        self.by_id = {msg[0]: msg for msg in self.messages}
+
+    def _new_message(self, index: int, internal_date: int):
+        rng = random.Random(self.seed * 1_000_003 + index)
+        labels = ["INBOX", rng.choice(["CATEGORY_UPDATES", "CATEGORY_PROMOTIONS", "CATEGORY_PERSONAL"])]
+        if rng.random() < self.unread_ratio:
+            labels.append("UNREAD")
+        return (f"{0x18c0000000000 + index:x}", internal_date, labels, index)
+
+    def add_messages(self, count: int) -> list:
+        """
+        Delivers `count` new messages now and records them in the history log.
+        """
+        with self.lock:
+            now_ms = int(time.time() * 1000)
+            added = []
+            for _ in range(count):
+                message = self._new_message(len(self.by_id), now_ms)
+                self.messages.insert(0, message)
+                self.by_id[message[0]] = message
+                self.history_id += 1
+                self.history.append((self.history_id, {
+                    "id": str(self.history_id),
+                    "messagesAdded": [{"message": {"id": message[0], "threadId": message[0], "labelIds": message[2]}}],
+                }))
+                added.append(message[0])
+            return added
+
+    def expire_history(self):
+        """
+        Drops all history so the next history.list for an older id answers 404.
+        """
+        with self.lock:
+            self.history = []
+            self.oldest_history_id = self.history_id
+
+    def render(self, message, fmt: str = "full", metadata_headers=None) -> dict:
+        """
+        Builds the Gmail message resource for the requested format.
+        """
+        msg_id, internal_date, labels, index = message
+        rng = random.Random(self.seed * 7_919 + index)
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        domain = rng.choice(DOMAINS)
+        sender = f"{first} {last} <{first.lower()}.{last.lower()}@{domain}>"
+        subject = rng.choice(SUBJECTS).format(n=rng.randint(1000, 99999))
+        text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(300, 1200)))
+        date = datetime.fromtimestamp(internal_date / 1000, timezone.utc).strftime("%a, %d %b %Y %H:%M:%S +0000")
+
+        headers = [
+            {"name": "Delivered-To", "value": "me@example.com"},
+            {"name": "Received", "value": f"by 2002:a05:{index:x} with SMTP id {msg_id}; {date}"},
+            {"name": "DKIM-Signature", "value": "v=1; a=rsa-sha256; d=" + domain + "; b=" + "A" * 344},
+            {"name": "From", "value": sender},
+            {"name": "To", "value": "Me <me@example.com>"},
+            {"name": "Subject", "value": subject},
+            {"name": "Date", "value": date},
+            {"name": "Message-ID", "value": f"<{msg_id}@{domain}>"},
+            {"name": "MIME-Version", "value": "1.0"},
+            {"name": "Content-Type", "value": "multipart/alternative; boundary=\"b1\""},
+        ]
+        resource = {
+            "id": msg_id,
+            "threadId": msg_id,
+            "labelIds": labels,
+            "snippet": text[:160],
+            "historyId": str(self.history_id),
+            "internalDate": str(internal_date),
+            "sizeEstimate": len(text) * 3,
+        }
+        if fmt == "minimal":
+            return resource
+        if fmt == "metadata":
+            wanted = {name.lower() for name in metadata_headers or []}
+            resource["payload"] = {
+                "mimeType": "multipart/alternative",
+                "headers": [h for h in headers if not wanted or h["name"].lower() in wanted],
+            }
+            return resource
+
+        def part(part_id, mime, body):
+            data = base64.urlsafe_b64encode(body.encode()).decode()
+            return {"partId": part_id, "mimeType": mime, "filename": "",
+                    "headers": [{"name": "Content-Type", "value": f"{mime}; charset=\"UTF-8\""}],
+                    "body": {"size": len(body), "data": data}}
+
+        resource["payload"] = {
+            "partId": "", "mimeType": "multipart/alternative", "filename": "", "headers": headers,
+            "body": {"size": 0},
+            "parts": [part("0", "text/plain", text), part("1", "text/html", f"<html><body><p>{text}</p></body></html>")],
+        }
+        return resource
+
+    def search(self, query: str) -> list:
+        """
+        Supports the query terms GmailService builds: after:, before: (epoch seconds) and is:unread.
+        """
+        after = before = None
+        unread_only = False
+        for term in (query or "").split():
+            if term.startswith("after:"):
+                after = int(term[6:]) * 1000
+            elif term.startswith("before:"):
+                before = int(term[7:]) * 1000
+            elif term == "is:unread":
+                unread_only = True
+        with self.lock:
+            return [
+                msg for msg in self.messages
+                if (after is None or msg[1] > after)
+                and (before is None or msg[1] < before)
+                and (not unread_only or "UNREAD" in msg[2])
+            ]
+
+
+def parse_fields(spec: str) -> dict:
+    """
+    Parses a partial-response `fields` mask (e.g. "id,payload/headers(name,value)")
+    into a nested dict where None selects the whole value.
+    """
+    pos = 0
+
+    def parse_list():
+        nonlocal pos
+        tree = {}
+        while pos < len(spec) and spec[pos] != ")":
+            match = re.match(r"[\w]+(?:/[\w]+)*", spec[pos:])
+            path = match.group(0).split("/")
+            pos += len(match.group(0))
+            sub = None
+            if pos < len(spec) and spec[pos] == "(":
+                pos += 1
+                sub = parse_list()
+                pos += 1  # closing parenthesis
+            node = tree
+            for name in path[:-1]:
+                node = node.setdefault(name, {}) or {}
+            node[path[-1]] = sub
+            if pos < len(spec) and spec[pos] == ",":
+                pos += 1
+        return tree
+
+    return parse_list()
+
+
+def apply_fields(value, tree):
+    if tree is None:
+        return value
+    if isinstance(value, list):
+        return [apply_fields(item, tree) for item in value]
+    if isinstance(value, dict):
+        return {key: apply_fields(value[key], sub) for key, sub in tree.items() if key in value}
+    return value
+
+
+class FakeGmailServer:
+    """
+    Threaded HTTP server exposing a SyntheticMailbox through the Gmail v1 REST surface.
+    """
+    def __init__(self, mailbox: SyntheticMailbox, host: str = "127.0.0.1", port: int = 0,
+                 latency_ms: float = 0.0, rate_limit_ratio: float = 0.0, seed: int = 7):
+        self.mailbox = mailbox
+        self.latency_ms = latency_ms
+        self.rate_limit_ratio = rate_limit_ratio
+        self.rng = random.Random(seed)
+        self.stats_lock = threading.Lock()
+        self.reset_stats()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="fake-gmail", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def reset_stats(self):
+        with self.stats_lock:
+            self.stats = {"http_requests": 0, "api_calls": 0, "rate_limited": 0,
+                          "bytes_sent": 0, "message_gets": 0, "message_bytes": 0}
+
+    def _count(self, **increments):
+        with self.stats_lock:
+            for key, value in increments.items():
+                self.stats[key] += value
+
+    def dispatch(self, method: str, target: str):
+        """
+        Routes one API call. Returns (status, JSON-serialisable body).
+        """
+        self._count(api_calls=1)
+        if self.rate_limit_ratio and self.rng.random() < self.rate_limit_ratio:
+            self._count(rate_limited=1)
+            return 429, RATE_LIMIT_ERROR
+
+        parts = urlsplit(target)
+        params = parse_qs(parts.query)
+        path = parts.path.split("/gmail/v1/users/me/", 1)[-1].strip("/")
+        first = lambda name, default=None: params.get(name, [default])[0]
+
+        if method != "GET":
+            return 405, {"error": {"code": 405, "message": "Method not allowed"}}
+
+        if path == "profile":
+            body = {"emailAddress": "me@example.com", "messagesTotal": len(self.mailbox.by_id),
+                    "historyId": str(self.mailbox.history_id)}
+        elif path == "messages":
+            matches = self.mailbox.search(first("q", ""))
+            offset = int(first("pageToken", "0"))
+            limit = min(int(first("maxResults", "100")), 500)
+            page = matches[offset:offset + limit]
+            body = {"messages": [{"id": m[0], "threadId": m[0]} for m in page],
+                    "resultSizeEstimate": len(matches)}
+            if offset + limit < len(matches):
+                body["nextPageToken"] = str(offset + limit)
+        elif path.startswith("messages/"):
+            message = self.mailbox.by_id.get(path.split("/", 1)[1])
+            if message is None:
+                return 404, {"error": {"code": 404, "message": "Requested entity was not found."}}
+            body = self.mailbox.render(message, first("format", "full"), params.get("metadataHeaders"))
+            self._count(message_gets=1)
+        elif path == "history":
+            start = int(first("startHistoryId", "0"))
+            if start < self.mailbox.oldest_history_id:
+                return 404, {"error": {"code": 404, "message": "Requested entity was not found."}}
+            records = [record for history_id, record in self.mailbox.history if history_id > start]
+            body = {"history": records, "historyId": str(self.mailbox.history_id)}
+        elif path.startswith("labels/"):
+            label = path.split("/", 1)[1]
+            with self.mailbox.lock:
+                labelled = [m for m in self.mailbox.messages if label in m[2]]
+            body = {"id": label, "name": label, "type": "system",
+                    "messagesTotal": len(labelled),
+                    "messagesUnread": sum("UNREAD" in m[2] for m in labelled)}
+        else:
+            return 404, {"error": {"code": 404, "message": f"Unknown path {parts.path}"}}
+
+        if "fields" in params:
+            body = apply_fields(body, parse_fields(first("fields")))
+        return 200, body
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                # Responses are written in two segments (headers, body); without this,
+                # Nagle plus the client's delayed ACK adds ~40 ms to every call
+                self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status: int, payload: bytes, content_type: str):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+                server._count(bytes_sent=len(payload))
+
+            def _delay(self):
+                if server.latency_ms:
+                    time.sleep(server.latency_ms / 1000)
+
+            def do_GET(self):
+                server._count(http_requests=1)
+                self._delay()
+                status, body = server.dispatch("GET", self.path)
+                payload = json.dumps(body).encode()
+                if status == 200 and "/messages/" in self.path:
+                    server._count(message_bytes=len(payload))
+                self._send(status, payload, "application/json; charset=UTF-8")
+
+            def do_POST(self):
+                server._count(http_requests=1)
+                self._delay()
+                length = int(self.headers.get("Content-Length", 0))
+                raw = self.rfile.read(length)
+                if not self.path.startswith("/batch"):
+                    self._send(404, b'{"error": {"code": 404}}', "application/json")
+                    return
+
+                envelope = BytesParser(policy=HTTP).parsebytes(
+                    f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode() + raw
+                )
+                boundary = "batch_fake_gmail_boundary"
+                chunks = []
+                for part in envelope.iter_parts():
+                    content_id = part["Content-ID"].strip("<>")
+                    request_line = part.get_payload(decode=True).decode().split("\r\n", 1)[0].split("\n", 1)[0]
+                    method, target = request_line.split(" ")[:2]
+                    status, body = server.dispatch(method, target)
+                    payload = json.dumps(body)
+                    if status == 200 and "/messages/" in target:
+                        server._count(message_bytes=len(payload))
+                    reason = {200: "OK", 404: "Not Found", 429: "Too Many Requests"}.get(status, "Error")
+                    chunks.append(
+                        f"--{boundary}\r\nContent-Type: application/http\r\n"
+                        f"Content-ID: <response-{content_id}>\r\n\r\n"
+                        f"HTTP/1.1 {status} {reason}\r\nContent-Type: application/json; charset=UTF-8\r\n"
+                        f"Content-Length: {len(payload)}\r\n\r\n{payload}\r\n"
+                    )
+                chunks.append(f"--{boundary}--\r\n")
+                self._send(200, "".join(chunks).encode(), f"multipart/mixed; boundary={boundary}")
+
+        return Handler
+
+
+def write_fake_token(path: str):
+    """
+    Writes an authorized-user token file the fake server accepts (it ignores auth).
+    """
+    expiry = (datetime.utcnow() + timedelta(days=365)).strftime("%Y-%m-%dT%H:%M:%SZ")
+    with open(path, "w") as token_file:
+        json.dump({"token": "fake-token", "refresh_token": "fake-refresh", "client_id": "fake",
+                   "client_secret": "fake", "expiry": expiry}, token_file)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a synthetic mailbox over a fake Gmail API")
+    parser.add_argument("--messages", type=int, default=5000, help="Mailbox size")
+    parser.add_argument("--days", type=int, default=180, help="Days of mail the mailbox spans")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Delay added to every HTTP request")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="Fraction of calls answered with 429")
+    args = parser.parse_args()
+
+    mailbox = SyntheticMailbox(size=args.messages, days=args.days)
+    server = FakeGmailServer(mailbox, port=args.port, latency_ms=args.latency_ms,
+                             rate_limit_ratio=args.rate_limit)
+    print(f"📮 Fake Gmail API with {args.messages} messages at {server.url} (Ctrl+C to stop)")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()